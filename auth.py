@@ -1,10 +1,16 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
 
+import cache
+
 load_dotenv()
 
 # Security settings
@@ -12,9 +18,35 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+
+def _parse_keys(value: str) -> Dict[str, str]:
+    """Parse "kid:secret,kid:secret" key rings"""
+    keys = {}
+    for item in value.split(","):
+        kid, _, secret = item.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+# Key-ID based rotation: new tokens are signed with JWT_ACTIVE_KEY_ID and carry it in the "kid" header.
+# Tokens signed with any other key still in JWT_KEYS keep validating during the rollover, and
+# tokens without a kid are verified with SECRET_KEY.
+JWT_KEYS = _parse_keys(os.getenv("JWT_KEYS", ""))
+JWT_ACTIVE_KEY_ID = os.getenv("JWT_ACTIVE_KEY_ID") or None
+
+# Verified tokens, keyed by digest, so repeat requests skip signature verification
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+_token_cache = cache.TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 # Password hashing - using bcrypt_sha256 to avoid bcrypt's 72-byte password limit
 pwd_context = CryptContext(schemes=["bcrypt_sha256", "bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so a small thread pool hashes in parallel without blocking the event loop.
+# The worker count caps concurrent hashing per process; extra logins queue for a free worker.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
@@ -29,6 +61,24 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(safe_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash if the stored one uses outdated settings"""
+    safe_password = plain_password[:72]
+    return pwd_context.verify_and_update(safe_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password on the password hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_and_update_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -39,15 +89,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    
+    if JWT_ACTIVE_KEY_ID in JWT_KEYS:
+        encoded_jwt = jwt.encode(
+            to_encode, JWT_KEYS[JWT_ACTIVE_KEY_ID], algorithm=ALGORITHM, headers={"kid": JWT_ACTIVE_KEY_ID}
+        )
+    else:
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     return encoded_jwt
 
 
+def configure_keys(secret_key: str, keys: Optional[Dict[str, str]] = None, active_key_id: Optional[str] = None):
+    """Rotate signing keys at runtime and drop every cached verification"""
+    global SECRET_KEY, JWT_KEYS, JWT_ACTIVE_KEY_ID
+    SECRET_KEY = secret_key
+    JWT_KEYS = dict(keys or {})
+    JWT_ACTIVE_KEY_ID = active_key_id
+    _token_cache.clear()
+
+
+def _verification_key(kid: Optional[str]) -> Optional[str]:
+    if kid is None:
+        return SECRET_KEY
+    if not isinstance(kid, str):
+        # The header is unverified: a malformed kid (a list, a number) just fails verification
+        return None
+    return JWT_KEYS.get(kid)
+
+
+def _key_fingerprint(key: str) -> bytes:
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode JWT access token"""
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    
+    cached = _token_cache.get(digest)
+    if cached is not None:
+        payload, kid, fingerprint = cached
+        key = _verification_key(kid)
+        # The signing key may have been rotated out since this token was verified
+        if key is not None and _key_fingerprint(key) == fingerprint and payload["exp"] > time.time():
+            return dict(payload)
+        _token_cache.pop(digest)
+    
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = _verification_key(kid)
+        if key is None:
+            return None
+        payload = jwt.decode(token, key, algorithms=[ALGORITHM])
     except JWTError:
         return None
+    
+    # Tokens without an exp never expire in jose, so only cache ones that do
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _token_cache.set(digest, (dict(payload), kid, _key_fingerprint(key)), ttl_seconds=exp - time.time())
+    
+    return payload
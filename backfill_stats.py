@@ -0,0 +1,115 @@
+"""
+Rebuild users.stats, users.activity_window and activity_heatmaps from daily_activities and track_progress.
+Safe to re-run: every user's stats and heatmaps are recomputed from scratch and overwritten.
+Run: python backfill_stats.py
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne, UpdateOne
+
+import database
+import heatmap
+import stats
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+
+
+async def activity_by_user(db):
+    """Per-user totals and active days from daily_activities"""
+    pipeline = [
+        {"$sort": {"user_id": 1, "activity_date": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "total_xp": {"$sum": "$xp_earned"},
+            "total_minutes": {"$sum": "$time_spent_minutes"},
+            "days": {"$push": {
+                "date": "$activity_date",
+                "tasks": "$tasks_completed",
+                "xp": "$xp_earned",
+                "minutes": "$time_spent_minutes"
+            }}
+        }}
+    ]
+    return {doc["_id"]: doc async for doc in db.daily_activities.aggregate(pipeline, allowDiskUse=True)}
+
+
+async def enrollments_by_user(db):
+    pipeline = [
+        {"$match": {"is_enrolled": True}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]
+    return {doc["_id"]: doc["count"] async for doc in db.track_progress.aggregate(pipeline)}
+
+
+def stats_update(activity, courses_started: int, today: datetime):
+    fields = {"stats.courses_started": courses_started}
+    if activity is None:
+        return {"$set": fields}
+
+    days = [day for day in activity["days"] if (day.get("tasks") or 0) > 0]
+    window_start = today - timedelta(days=stats.ACTIVITY_WINDOW_DAYS - 1)
+    fields.update({
+        "stats.total_xp": activity["total_xp"] or 0,
+        "stats.total_hours": (activity["total_minutes"] or 0) / 60,
+        "stats.streak_days": stats.compute_streak([day["date"] for day in days]),
+        "stats.last_active_day": days[-1]["date"] if days else None,
+        "activity_window": [
+            {"date": day["date"], "xp": day.get("xp") or 0, "minutes": day.get("minutes") or 0}
+            for day in days if day["date"] >= window_start
+        ]
+    })
+    return {"$set": fields}
+
+
+async def write_batches(db, user_writes, heatmap_replacements):
+    await db.users.bulk_write(user_writes, ordered=False)
+    if heatmap_replacements:
+        await db.activity_heatmaps.bulk_write(heatmap_replacements, ordered=False)
+
+
+def heatmap_writes(user_id, activity):
+    years = {}
+    for day in activity["days"]:
+        doc = years.setdefault(day["date"].year, heatmap.empty_year(user_id, day["date"].year))
+        index = heatmap.day_index(day["date"])
+        doc["tasks"][index] += day.get("tasks") or 0
+        doc["xp"][index] += day.get("xp") or 0
+    return [ReplaceOne({"user_id": user_id, "year": year}, doc, upsert=True) for year, doc in years.items()]
+
+
+async def backfill_stats():
+    try:
+        await database.connect_to_mongo()
+        db = database.get_database()
+        today = stats.start_of_day(datetime.utcnow())
+
+        activity, enrollments = await asyncio.gather(activity_by_user(db), enrollments_by_user(db))
+        user_ids = set(activity) | set(enrollments)
+        print(f"📊 Rebuilding stats for {len(user_ids)} users")
+
+        batch, heatmap_batch, written = [], [], 0
+        for user_id in user_ids:
+            update = stats_update(activity.get(user_id), enrollments.get(user_id, 0), today)
+            batch.append(UpdateOne(stats.user_filter(user_id), update))
+            if user_id in activity:
+                heatmap_batch.extend(heatmap_writes(user_id, activity[user_id]))
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                await write_batches(db, batch, heatmap_batch)
+                written += len(batch)
+                batch, heatmap_batch = [], []
+                print(f"   {written}/{len(user_ids)}")
+        if batch:
+            await write_batches(db, batch, heatmap_batch)
+            written += len(batch)
+
+        print(f"✅ Stats rebuilt for {written} users")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        await database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_stats())
@@ -0,0 +1,259 @@
+"""
+Batch (re-)grading of many submissions, e.g. a whole cohort after the grading criteria change.
+Used by POST /evaluate/batch and as a CLI:
+    python batch_evaluation.py --track chatgpt [--lesson 2] [--limit 500] [--dry-run]
+    python batch_evaluation.py --file items.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import openai
+from bson import ObjectId
+from dotenv import load_dotenv
+from pydantic import BaseModel, field_validator
+from pymongo import UpdateOne
+
+import database
+import evaluation
+import llm
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Batch evaluation settings
+BATCH_EVAL_CONCURRENCY = int(os.getenv("BATCH_EVAL_CONCURRENCY", "8"))
+BATCH_EVAL_MAX_ATTEMPTS = int(os.getenv("BATCH_EVAL_MAX_ATTEMPTS", "5"))
+BATCH_EVAL_BACKOFF_SECONDS = float(os.getenv("BATCH_EVAL_BACKOFF_SECONDS", "1"))
+BATCH_EVAL_MAX_BACKOFF_SECONDS = float(os.getenv("BATCH_EVAL_MAX_BACKOFF_SECONDS", "30"))
+BATCH_EVAL_WRITE_BATCH = int(os.getenv("BATCH_EVAL_WRITE_BATCH", "100"))
+BATCH_EVAL_MAX_ITEMS = int(os.getenv("BATCH_EVAL_MAX_ITEMS", "5000"))
+
+
+class BatchItem(BaseModel):
+    prompt: str
+    output: str
+    track: str
+    lesson_index: int = 0
+    task_text: Optional[str] = None
+    completion_id: Optional[str] = None  # task_completions _id to write the new score back to
+
+    @field_validator("completion_id")
+    @classmethod
+    def valid_object_id(cls, value):
+        # Checked up front: a bad id found while streaming results would cut the response off
+        if value is not None and not ObjectId.is_valid(value):
+            raise ValueError(f"completion_id is not a valid ObjectId: {value!r}")
+        return value
+
+
+class BatchSelection(BaseModel):
+    """Select submissions from task_completions"""
+    track: str
+    lesson_index: Optional[int] = None
+    completed_after: Optional[datetime] = None
+    limit: int = 1000
+
+
+class BatchEvaluator:
+    """
+    Grades items with a fixed number of workers. A 429 pauses every worker until the
+    provider's Retry-After has passed, instead of each one hammering the limit on its own.
+    """
+
+    def __init__(self, concurrency: int = BATCH_EVAL_CONCURRENCY, max_attempts: int = BATCH_EVAL_MAX_ATTEMPTS):
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self._resume_at = 0.0
+        self.retries = 0
+
+    async def _wait_for_rate_limit(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def grade(self, item: BatchItem) -> Dict[str, Any]:
+        messages = evaluation.evaluation_messages(
+            item.prompt, item.output, item.track, item.lesson_index, item.task_text or "User's current task"
+        )
+
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_for_rate_limit()
+            try:
+                return evaluation.evaluation_response(await evaluation.request_evaluation(messages, max_retries=0))
+            except Exception as e:
+                if attempt == self.max_attempts or not llm.is_retryable(e):
+                    raise
+
+                # Full jitter exponential backoff, unless the provider says how long to wait
+                delay = llm.retry_after_seconds(e)
+                if delay is None:
+                    delay = random.uniform(0, min(BATCH_EVAL_MAX_BACKOFF_SECONDS, BATCH_EVAL_BACKOFF_SECONDS * 2 ** attempt))
+                if isinstance(e, openai.RateLimitError):
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def run(self, items: List[BatchItem], write_back: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Grade every item and yield one progress event per item (in completion order), then a summary"""
+        start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(items):
+            queue.put_nowait((index, item))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                try:
+                    index, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results.put_nowait((index, item, await self.grade(item), None))
+                except Exception as e:
+                    results.put_nowait((index, item, None, e))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(items)))]
+        writes: List[UpdateOne] = []
+        succeeded = failed = written = write_failures = 0
+
+        try:
+            for done in range(1, len(items) + 1):
+                index, item, result, error = await results.get()
+                event = {"type": "result", "index": index, "done": done, "total": len(items)}
+
+                if error is not None:
+                    failed += 1
+                    event["error"] = str(error)
+                else:
+                    succeeded += 1
+                    event.update(score=result["score"], feedback_summary=result["feedback_summary"])
+                    if write_back and item.completion_id:
+                        writes.append(completion_update(item.completion_id, result))
+
+                if len(writes) >= BATCH_EVAL_WRITE_BATCH or (done == len(items) and writes):
+                    try:
+                        written += await write_results(writes)
+                    except Exception as e:
+                        write_failures += len(writes)
+                        logger.warning(f"Batch evaluation write-back failed: {e}")
+                    writes = []
+                yield event
+        finally:
+            # The client may disconnect mid-stream; don't leave workers spending LLM calls
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        elapsed = time.perf_counter() - start
+        yield {
+            "type": "summary",
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": failed,
+            "written": written,
+            "write_failures": write_failures,
+            "retries": self.retries,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(len(items) / elapsed, 2) if elapsed else None,
+        }
+
+
+def completion_update(completion_id: str, result: Dict[str, Any]) -> UpdateOne:
+    return UpdateOne(
+        {"_id": ObjectId(completion_id)},
+        {"$set": {
+            "ai_evaluation": result["evaluation"],
+            "score": result["score"],
+            "feedback_summary": result["feedback_summary"],
+            "regraded_at": datetime.utcnow()
+        }}
+    )
+
+
+async def write_results(writes: List[UpdateOne]) -> int:
+    result = await database.get_collection("task_completions").bulk_write(writes, ordered=False)
+    return result.modified_count
+
+
+async def select_items(selection: BatchSelection) -> List[BatchItem]:
+    """Submissions from task_completions matching a selection, newest first"""
+    query: Dict[str, Any] = {"track_slug": selection.track}
+    if selection.lesson_index is not None:
+        query["lesson_index"] = selection.lesson_index
+    if selection.completed_after is not None:
+        query["completed_at"] = {"$gte": selection.completed_after}
+
+    cursor = database.get_collection("task_completions").find(
+        query, {"prompt": 1, "user_output": 1, "track_slug": 1, "lesson_index": 1, "task_text": 1}
+    ).sort("completed_at", -1).limit(min(selection.limit, BATCH_EVAL_MAX_ITEMS))
+
+    return [
+        BatchItem(
+            prompt=doc.get("prompt") or "",
+            output=doc.get("user_output") or "",
+            track=doc["track_slug"],
+            lesson_index=doc.get("lesson_index") or 0,
+            task_text=doc.get("task_text"),
+            completion_id=str(doc["_id"])
+        )
+        async for doc in cursor
+    ]
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-grade submissions in bulk")
+    parser.add_argument("--track", help="select task_completions for this track")
+    parser.add_argument("--lesson", type=int, help="only this lesson index")
+    parser.add_argument("--after", type=datetime.fromisoformat, help="only completions after this ISO date")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--file", help="JSON list of {prompt, output, track, lesson_index} items instead of a selection")
+    parser.add_argument("--concurrency", type=positive_int, default=BATCH_EVAL_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="grade but don't write scores back")
+    args = parser.parse_args()
+
+    if not args.file and not args.track:
+        parser.error("either --track or --file is required")
+
+    try:
+        await database.connect_to_mongo()
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                items = [BatchItem(**item) for item in json.load(f)]
+        else:
+            items = await select_items(BatchSelection(
+                track=args.track, lesson_index=args.lesson, completed_after=args.after, limit=args.limit
+            ))
+
+        print(f"🔄 Grading {len(items)} submissions with {args.concurrency} workers...")
+        async for event in BatchEvaluator(args.concurrency).run(items, write_back=not args.dry_run):
+            if event["type"] == "summary":
+                print(f"✅ {event['succeeded']} graded, {event['failed']} failed, {event['written']} written back, "
+                      f"{event['retries']} retries in {event['elapsed_seconds']}s ({event['items_per_second']} items/s)")
+            elif "error" in event:
+                print(f"   ❌ [{event['done']}/{event['total']}] item {event['index']}: {event['error']}")
+            else:
+                print(f"   [{event['done']}/{event['total']}] item {event['index']}: score {event['score']}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        await database.close_mongo_connection()
+        await llm.close_llm_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
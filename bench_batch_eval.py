@@ -0,0 +1,76 @@
+"""
+Batch evaluation throughput benchmark against the local fake LLM server
+Compares grading a cohort one /evaluate-style call at a time with BatchEvaluator at several
+concurrency levels. Set FAKE_LLM_RATE_LIMIT_RATIO (e.g. 0.1) to exercise the 429 retry path.
+Run: python bench_batch_eval.py
+"""
+import asyncio
+import os
+import time
+
+import uvicorn
+
+FAKE_LLM_PORT = int(os.getenv("FAKE_LLM_PORT", "9100"))
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{FAKE_LLM_PORT}/v1"
+os.environ.setdefault("FASTROUTER_API_KEY", "fake-key")
+
+import batch_evaluation
+import evaluation
+import llm
+from fake_llm_server import app as fake_app, FAKE_LLM_LATENCY_MS, FAKE_LLM_RATE_LIMIT_RATIO
+
+BENCH_BATCH_ITEMS = int(os.getenv("BENCH_BATCH_ITEMS", "100"))
+CONCURRENCY_LEVELS = [4, 8, 16, 32]
+
+
+def cohort():
+    return [
+        batch_evaluation.BatchItem(
+            prompt=f"Explain recursion to a 10 year old, attempt {i}",
+            output="Recursion is when a function calls itself...",
+            track="chatgpt",
+            lesson_index=i % 3
+        )
+        for i in range(BENCH_BATCH_ITEMS)
+    ]
+
+
+async def sequential(items):
+    start = time.perf_counter()
+    for item in items:
+        messages = evaluation.evaluation_messages(item.prompt, item.output, item.track, item.lesson_index)
+        try:
+            await llm.chat_completion(messages)
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"   sequential          items={len(items):>4}  time={elapsed:6.2f}s  throughput={len(items) / elapsed:7.2f} items/s")
+
+
+async def batched(items, concurrency):
+    async for event in batch_evaluation.BatchEvaluator(concurrency).run(items, write_back=False):
+        if event["type"] == "summary":
+            print(f"   batch concurrency={concurrency:>3}  items={event['total']:>4}  time={event['elapsed_seconds']:6.2f}s  "
+                  f"throughput={event['items_per_second']:7.2f} items/s  retries={event['retries']}  failed={event['failed']}")
+
+
+async def main():
+    server = uvicorn.Server(uvicorn.Config(fake_app, port=FAKE_LLM_PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"🔄 Fake LLM latency: {FAKE_LLM_LATENCY_MS:.0f} ms, 429 ratio: {FAKE_LLM_RATE_LIMIT_RATIO:.0%}")
+    try:
+        items = cohort()
+        await sequential(items[:max(1, len(items) // 10)])
+        for level in CONCURRENCY_LEVELS:
+            await batched(items, level)
+    finally:
+        await llm.close_llm_client()
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
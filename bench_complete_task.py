@@ -0,0 +1,77 @@
+"""
+Task completion latency benchmark against a local mongod
+Compares the old six sequential calls (find_one pre-check, insert, users update,
+track_progress read-then-write, daily upsert) with completion.record_completion.
+Run: python bench_complete_task.py   (uses BENCH_MONGODB_URL, default mongodb://localhost:27017)
+"""
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import completion
+import database
+
+BENCH_MONGODB_URL = os.getenv("BENCH_MONGODB_URL", "mongodb://localhost:27017")
+BENCH_DATABASE_NAME = os.getenv("BENCH_DATABASE_NAME", "mentora_bench")
+BENCH_COMPLETIONS = int(os.getenv("BENCH_COMPLETIONS", "500"))
+
+
+async def legacy_complete(db, user_id, task_id, data):
+    existing = await db.task_completions.find_one({"user_id": user_id, "track_slug": data["track_slug"], "task_id": task_id})
+    if existing:
+        return
+    now = datetime.utcnow()
+    await db.task_completions.insert_one({"user_id": user_id, "track_slug": data["track_slug"], "task_id": task_id, "completed_at": now, "xp_earned": 10})
+    await db.users.update_one({"_id": ObjectId(user_id)}, {"$inc": {"stats.total_xp": 10}, "$set": {"stats.last_activity_date": now}})
+    track = await db.track_progress.find_one({"user_id": user_id, "track_slug": data["track_slug"]})
+    if track:
+        percent = completion.calculate_progress_percentage(data["track_slug"], track["tasks_completed"] + 1)
+        await db.track_progress.update_one({"_id": track["_id"]}, {"$inc": {"tasks_completed": 1}, "$set": {"percent_complete": percent, "last_accessed": now}})
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    await db.daily_activities.update_one({"user_id": user_id, "activity_date": today}, {"$inc": {"tasks_completed": 1, "xp_earned": 10}}, upsert=True)
+
+
+async def new_complete(db, user_id, task_id, data):
+    await completion.record_completion(user_id, task_id, data)
+
+
+async def measure(name, complete, db, user_id):
+    latencies = []
+    data = {"track_slug": "chatgpt", "lesson_index": 0, "task_index": 1, "xp_earned": 10}
+    for i in range(BENCH_COMPLETIONS):
+        start = time.perf_counter()
+        await complete(db, user_id, f"{name}-{i}", data)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"   {name:<8} p50={statistics.median(latencies):6.2f} ms  p99={p99:6.2f} ms")
+
+
+async def main():
+    client = AsyncIOMotorClient(BENCH_MONGODB_URL)
+    await client.drop_database(BENCH_DATABASE_NAME)
+    db = client[BENCH_DATABASE_NAME]
+    database.client, database.database = client, db
+    await database.create_indexes()
+
+    user_id = ObjectId()
+    await db.users.insert_one({"_id": user_id, "stats": {"total_xp": 0, "total_hours": 0.0}})
+    await db.track_progress.insert_one({"user_id": str(user_id), "track_slug": "chatgpt", "tasks_completed": 0, "lessons_completed": 0})
+
+    print(f"📊 {BENCH_COMPLETIONS} completions each against {BENCH_MONGODB_URL}")
+    try:
+        await measure("legacy", legacy_complete, db, str(user_id))
+        await measure("engine", new_complete, db, str(user_id))
+    finally:
+        await client.drop_database(BENCH_DATABASE_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
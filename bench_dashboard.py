@@ -0,0 +1,72 @@
+"""
+Dashboard benchmark
+Compares a home page load made of four separate calls with one /api/users/dashboard call,
+under concurrency, against a running server.
+Start the server first (uvicorn main:app) and create the test user (python create_user.py).
+Run: python bench_dashboard.py
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000")
+BENCH_USERNAME = os.getenv("BENCH_USERNAME", "testuser")
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD", "test123")
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+BENCH_PAGE_LOADS = int(os.getenv("BENCH_PAGE_LOADS", "200"))
+
+SEPARATE_CALLS = [
+    "/api/users/me",
+    "/api/users/stats",
+    "/api/users/daily-progress",
+    "/api/tracks/enrolled",
+]
+
+
+async def separate_calls(client: httpx.AsyncClient):
+    responses = await asyncio.gather(*(client.get(path) for path in SEPARATE_CALLS))
+    for response in responses:
+        response.raise_for_status()
+
+
+async def dashboard_call(client: httpx.AsyncClient):
+    response = await client.get("/api/users/dashboard")
+    response.raise_for_status()
+
+
+async def run(name, page_load, client):
+    latencies = []
+    semaphore = asyncio.Semaphore(BENCH_CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await page_load(client)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(BENCH_PAGE_LOADS)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"   {name:<16} p50={statistics.median(latencies):7.1f} ms  p95={p95:7.1f} ms  page loads/s={BENCH_PAGE_LOADS / elapsed:7.1f}")
+
+
+async def main():
+    limits = httpx.Limits(max_connections=BENCH_CONCURRENCY * len(SEPARATE_CALLS))
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=30) as client:
+        login = await client.post("/api/auth/login", json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        print(f"📊 {BENCH_PAGE_LOADS} page loads, {BENCH_CONCURRENCY} concurrent")
+        await run("4 separate calls", separate_calls, client)
+        await run("dashboard", dashboard_call, client)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
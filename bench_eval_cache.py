@@ -0,0 +1,81 @@
+"""
+Evaluation cache benchmark
+Replays evaluation traffic through the in-process cache tier and reports the hit rate
+and the LLM latency the hits would have saved.
+
+Set EVAL_REPLAY_LOG to a JSONL file with {"track", "lesson_title", "prompt", "output"}
+records to replay real traffic; otherwise synthetic traffic with resubmissions is used.
+Run: python bench_eval_cache.py
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from cache import EvaluationCache
+from main import build_evaluation_prompt
+
+EVAL_REPLAY_LOG = os.getenv("EVAL_REPLAY_LOG")
+BENCH_REQUESTS = int(os.getenv("BENCH_REQUESTS", "5000"))
+BENCH_RESUBMIT_RATE = float(os.getenv("BENCH_RESUBMIT_RATE", "0.3"))
+BENCH_LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", "4000"))
+MODEL = "openai/gpt-4o-mini"
+
+LESSONS = [
+    "Understanding LLM Behavior",
+    "Core Prompting Techniques",
+    "Prompt Structure Framework",
+    "Iteration & Refinement",
+    "Real-World Applications",
+    "Advanced Prompting",
+]
+
+
+def load_traffic():
+    if EVAL_REPLAY_LOG:
+        with open(EVAL_REPLAY_LOG) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    rng = random.Random(42)
+    traffic = []
+    for i in range(BENCH_REQUESTS):
+        if traffic and rng.random() < BENCH_RESUBMIT_RATE:
+            # Double clicks and retries resend a recent submission, sometimes with stray whitespace
+            previous = dict(rng.choice(traffic[-20:]))
+            if rng.random() < 0.5:
+                previous["prompt"] = previous["prompt"] + "\n"
+            traffic.append(previous)
+        else:
+            traffic.append({
+                "track": "chatgpt",
+                "lesson_title": rng.choice(LESSONS),
+                "prompt": f"Act as a marketer and write campaign copy #{i} " * 10,
+                "output": f"Here is campaign copy number {i}. " * 40,
+            })
+    return traffic
+
+
+async def main():
+    traffic = load_traffic()
+    evaluation_cache = EvaluationCache(maxsize=2048, ttl_seconds=3600)
+
+    start = time.perf_counter()
+    for record in traffic:
+        prompt = build_evaluation_prompt(record["prompt"], record["output"], record["lesson_title"], "User's current task")
+        key = evaluation_cache.make_key([{"role": "user", "content": prompt}], MODEL)
+        if await evaluation_cache.get(key) is None:
+            await evaluation_cache.set(key, "Score: 7/10", MODEL)
+    elapsed = time.perf_counter() - start
+
+    stats = evaluation_cache.stats()
+    saved_seconds = stats["hits"] * BENCH_LLM_LATENCY_MS / 1000
+
+    print(f"📊 Replayed {len(traffic)} evaluations")
+    print(f"   Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {stats['hit_ratio']:.1%}")
+    print(f"   Cache overhead: {elapsed / len(traffic) * 1e6:.1f} µs per request (key build + lookup)")
+    print(f"   LLM time saved: {saved_seconds:.0f} s at {BENCH_LLM_LATENCY_MS:.0f} ms per evaluation")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
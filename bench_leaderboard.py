@@ -0,0 +1,85 @@
+"""
+Leaderboard benchmark against a local mongod with synthetic users
+Compares Mongo queries (sort + skip for a page, count of higher scores for a rank) with the
+in-memory leaderboard.Leaderboard after loading it from the same collection.
+Run: python bench_leaderboard.py   (uses BENCH_MONGODB_URL, default mongodb://localhost:27017)
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne
+
+import leaderboard
+
+BENCH_MONGODB_URL = os.getenv("BENCH_MONGODB_URL", "mongodb://localhost:27017")
+BENCH_DATABASE_NAME = os.getenv("BENCH_DATABASE_NAME", "mentora_bench")
+BENCH_USERS = int(os.getenv("BENCH_USERS", "1000000"))
+BENCH_QUERIES = int(os.getenv("BENCH_QUERIES", "200"))
+INSERT_BATCH = 10000
+
+
+async def seed(db):
+    await db.users.drop()
+    for start in range(0, BENCH_USERS, INSERT_BATCH):
+        await db.users.bulk_write([
+            InsertOne({"username": f"user{i}", "stats": {"total_xp": int(random.paretovariate(1.5) * 10)}})
+            for i in range(start, min(start + INSERT_BATCH, BENCH_USERS))
+        ], ordered=False)
+    await db.users.create_index([("stats.total_xp", -1)])
+
+
+async def timed(name, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await query()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"   {name:<28} p50={statistics.median(latencies):8.3f} ms  p99={p99:8.3f} ms")
+
+
+async def main():
+    client = AsyncIOMotorClient(BENCH_MONGODB_URL)
+    db = client[BENCH_DATABASE_NAME]
+
+    print(f"📊 Seeding {BENCH_USERS} users...")
+    await seed(db)
+
+    start = time.perf_counter()
+    scores = {}
+    async for user in db.users.find({"stats.total_xp": {"$gt": 0}}, {"stats.total_xp": 1}):
+        scores[str(user["_id"])] = user["stats"]["total_xp"]
+    board = leaderboard.Leaderboard(scores)
+    print(f"   in-memory load: {time.perf_counter() - start:.1f} s for {len(board)} users")
+
+    sample = [doc async for doc in db.users.aggregate([{"$sample": {"size": BENCH_QUERIES}}])]
+    pages = [random.randrange(0, len(board) - 10) for _ in range(BENCH_QUERIES)]
+
+    async def mongo_page(offset):
+        return [doc async for doc in db.users.find({}, {"stats.total_xp": 1}).sort("stats.total_xp", -1).skip(offset).limit(10)]
+
+    async def mongo_rank(user):
+        return await db.users.count_documents({"stats.total_xp": {"$gt": user["stats"]["total_xp"]}}) + 1
+
+    async def memory(fn):
+        return fn()
+
+    await timed("mongo top 10", [lambda: mongo_page(0)] * BENCH_QUERIES)
+    await timed("memory top 10", [lambda: memory(lambda: board.top(10))] * BENCH_QUERIES)
+    await timed("mongo random page (skip)", [lambda offset=offset: mongo_page(offset) for offset in pages])
+    await timed("memory random page", [lambda offset=offset: memory(lambda: board.top(10, offset)) for offset in pages])
+    await timed("mongo my rank (count)", [lambda user=user: mongo_rank(user) for user in sample])
+    await timed("memory my rank", [lambda user=user: memory(lambda: board.rank(str(user["_id"]))) for user in sample])
+    await timed("memory record completion", [lambda user=user: memory(lambda: board.add(str(user["_id"]), 10)) for user in sample])
+
+    await client.drop_database(BENCH_DATABASE_NAME)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
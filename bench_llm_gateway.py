@@ -0,0 +1,113 @@
+"""
+LLM gateway benchmark against two local fake OpenAI-compatible servers
+- tail latency: the primary answers FAKE_LLM_SLOW_RATIO of requests slowly; compares p50/p95/p99
+  with hedging off and on (hedge to the backup after the recent p95)
+- outage: the primary starts failing every request halfway through; shows failover to the
+  backup and the primary's circuit opening
+Run: python bench_llm_gateway.py [--requests 400] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import uvicorn
+
+os.environ.setdefault("FASTROUTER_API_KEY", "fake-key")
+
+import llm
+from fake_llm_server import create_app
+
+PRIMARY_PORT = int(os.getenv("FAKE_LLM_PORT", "9100"))
+BACKUP_PORT = PRIMARY_PORT + 1
+MESSAGES = [{"role": "user", "content": "Generate ONE practical task"}]
+
+
+async def start_server(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def make_gateway(backend_names, hedge):
+    ports = {"primary": PRIMARY_PORT, "backup": BACKUP_PORT}
+    backends = [
+        llm.Backend(name, f"http://127.0.0.1:{ports[name]}/v1", "fake-key", timeout_seconds=10,
+                    breaker=llm.CircuitBreaker(failure_threshold=5, cooldown_seconds=5))
+        for name in backend_names
+    ]
+    return llm.Gateway(backends, max_attempts=3, hedge=hedge, max_concurrency=100)
+
+
+async def run_load(gateway, total, concurrency, on_progress=None):
+    latencies, failures = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal failures
+        for i in remaining:
+            if on_progress:
+                on_progress(i)
+            start = time.perf_counter()
+            try:
+                await gateway.chat_completion(MESSAGES, route=llm.GENERATE)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures
+
+
+def report(name, latencies, failures):
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"   {name:<28} ok={len(latencies):>4}  failed={failures:>3}  "
+          f"p50={cuts[49] * 1000:6.0f}ms  p95={cuts[94] * 1000:6.0f}ms  p99={cuts[98] * 1000:6.0f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    primary_app = create_app(latency_ms=300, jitter_ms=100, slow_ratio=0.05, slow_latency_ms=3000)
+    backup_app = create_app(latency_ms=300, jitter_ms=100)
+    servers = [await start_server(primary_app, PRIMARY_PORT), await start_server(backup_app, BACKUP_PORT)]
+
+    try:
+        print("🔄 Tail latency: primary 300-400 ms, 5% of requests 3000 ms")
+        for name, backends, hedge in (
+            ("primary only", ["primary"], False),
+            ("primary + backup, hedged", ["primary", "backup"], True),
+        ):
+            gateway = make_gateway(backends, hedge)
+            # Warm up the latency window the hedge threshold is taken from
+            await run_load(gateway, 40, args.concurrency)
+            report(name, *await run_load(gateway, args.requests, args.concurrency))
+            print(f"     hedge threshold: {gateway.stats()['hedge_delay_seconds']}")
+            await gateway.close()
+
+        print("🔄 Outage: primary fails every request after the first half")
+        for name, backends in (("primary only", ["primary"]), ("primary + backup", ["primary", "backup"])):
+            primary_app.state.error_ratio = 0.0
+            gateway = make_gateway(backends, hedge=False)
+
+            def take_down(i):
+                if i == args.requests // 2:
+                    primary_app.state.error_ratio = 1.0
+
+            report(name, *await run_load(gateway, args.requests, args.concurrency, take_down))
+            print(f"     backends: {gateway.stats()['backends']}")
+            await gateway.close()
+    finally:
+        for server, task in servers:
+            server.should_exit = True
+            await task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Logging overhead benchmark
+Serves a route that logs once per item it returns (like the old enrolled-tracks loop) and
+measures request latency under concurrent load with logging off, the old synchronous
+basicConfig file handler, and the logging_config queue pipeline (JSON, optionally sampled).
+--sink-ms adds a delay to every write, standing in for a slow disk or a full stdout pipe.
+Run: python bench_logging.py [--requests 2000] [--concurrency 50] [--lines 6] [--sink-ms 0.2]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import logging_config
+
+logger = logging.getLogger("bench.tracks")
+
+
+class SlowFileHandler(logging.FileHandler):
+    """File handler whose writes take at least sink_ms"""
+
+    def __init__(self, filename, sink_ms):
+        super().__init__(filename, encoding="utf-8")
+        self.sink_seconds = sink_ms / 1000
+
+    def emit(self, record):
+        super().emit(record)
+        if self.sink_seconds:
+            time.sleep(self.sink_seconds)
+
+
+def build_app(lines):
+    app = FastAPI()
+    app.add_middleware(logging_config.RequestIdMiddleware)
+
+    @app.get("/tracks")
+    async def tracks():
+        items = []
+        for i in range(lines):
+            logger.info(f"TRACK: track-{i} - Tasks: {i * 3} - Percent: {i * 10}")
+            items.append({"track": f"track-{i}", "percent": i * 10})
+        return items
+
+    return app
+
+
+def configure(mode, log_file, sink_ms=0.0):
+    logging_config.logging_setup.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    if mode == "off":
+        root.setLevel(logging.WARNING)
+    elif mode == "sync file":
+        handler = SlowFileHandler(log_file, sink_ms)
+        logging.basicConfig(handlers=[handler], level=logging.INFO, format="%(asctime)s - %(message)s", force=True)
+    elif mode == "queue json":
+        logging_config.logging_setup.configure(
+            level="INFO", log_format="json", sample_rates={}, handler=SlowFileHandler(log_file, sink_ms)
+        )
+    elif mode == "queue json 10%":
+        logging_config.logging_setup.configure(
+            level="INFO", log_format="json", sample_rates={"bench": 0.1}, handler=SlowFileHandler(log_file, sink_ms)
+        )
+    # Keep the HTTP client's own request logs out of the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def load(app, total, concurrency):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get("/tracks")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=6, help="log lines per request")
+    parser.add_argument("--sink-ms", type=float, default=0.0, help="extra time per log write")
+    args = parser.parse_args()
+
+    app = build_app(args.lines)
+    print(f"🔄 {args.requests} requests, concurrency {args.concurrency}, {args.lines} log lines per request, {args.sink_ms} ms per write")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "sync file", "queue json", "queue json 10%"):
+            log_file = os.path.join(tmp, mode.replace(" ", "_").replace("%", "") + ".log")
+            configure(mode, log_file, args.sink_ms)
+            latencies, elapsed = asyncio.run(load(app, args.requests, args.concurrency))
+            configure("off", log_file)  # flush the queue before reading the file size
+            written = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+            cuts = statistics.quantiles(latencies, n=100)
+            print(f"   {mode:<15} p50={cuts[49] * 1000:6.2f}ms  p99={cuts[98] * 1000:6.2f}ms  "
+                  f"throughput={len(latencies) / elapsed:7.0f} req/s  written={written / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
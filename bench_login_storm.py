@@ -0,0 +1,78 @@
+"""
+Login storm benchmark
+Runs a burst of concurrent logins against a running server while probing an unrelated
+endpoint, and reports the probe's latency percentiles.
+Start the server first (uvicorn main:app) and create the test user (python create_user.py).
+Run: python bench_login_storm.py
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000")
+BENCH_USERNAME = os.getenv("BENCH_USERNAME", "testuser")
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD", "test123")
+BENCH_LOGIN_CONCURRENCY = int(os.getenv("BENCH_LOGIN_CONCURRENCY", "50"))
+BENCH_LOGINS = int(os.getenv("BENCH_LOGINS", "300"))
+BENCH_PROBE_PATH = os.getenv("BENCH_PROBE_PATH", "/lessons/chatgpt")
+BENCH_PROBE_INTERVAL_MS = float(os.getenv("BENCH_PROBE_INTERVAL_MS", "20"))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def login_storm(client: httpx.AsyncClient, latencies: list):
+    semaphore = asyncio.Semaphore(BENCH_LOGIN_CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/auth/login", json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(BENCH_LOGINS)))
+
+
+async def probe(client: httpx.AsyncClient, latencies: list, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get(BENCH_PROBE_PATH)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(BENCH_PROBE_INTERVAL_MS / 1000)
+
+
+async def main():
+    limits = httpx.Limits(max_connections=BENCH_LOGIN_CONCURRENCY + 1)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=120) as client:
+        baseline, login_latencies, storm_probe = [], [], []
+
+        # Probe latency with no logins running
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, baseline, done))
+        await asyncio.sleep(2)
+        done.set()
+        await probe_task
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, storm_probe, done))
+        start = time.perf_counter()
+        await login_storm(client, login_latencies)
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    print(f"📊 {BENCH_LOGINS} logins, {BENCH_LOGIN_CONCURRENCY} concurrent: {BENCH_LOGINS / elapsed:.1f} logins/s")
+    print(f"   login             p50={statistics.median(login_latencies):8.1f} ms  p99={percentile(login_latencies, 0.99):8.1f} ms")
+    print(f"   {BENCH_PROBE_PATH} idle   p50={statistics.median(baseline):8.1f} ms  p99={percentile(baseline, 0.99):8.1f} ms")
+    print(f"   {BENCH_PROBE_PATH} storm  p50={statistics.median(storm_probe):8.1f} ms  p99={percentile(storm_probe, 0.99):8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
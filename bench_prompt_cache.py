@@ -0,0 +1,147 @@
+"""
+Prompt prefix caching harness
+Replays a log of task generation requests through the old layout (user state in the middle of
+the system prompt) and task_prompt.build_task_messages, and reports prompt tokens per call and
+the share of each prompt that a provider prefix cache could serve (longest prefix already seen).
+Run: python bench_prompt_cache.py [--log requests.jsonl] [--requests 500] [--verbose]
+Log lines are JSON objects: {"track", "lesson_index", "task_no", "preferences", "previous_feedback"}.
+Token counts use tiktoken when it is installed, otherwise a word/punctuation approximation.
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+
+import curriculum_registry
+import task_prompt
+
+# OpenAI-style caching: prompts from 1024 tokens, cache hits in 128-token increments
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT = 128
+
+SAMPLE_PREFERENCES = [
+    None,
+    {"role": "Marketer", "goal": "write campaign copy", "level": "beginner"},
+    {"role": "Developer", "goal": "generate unit tests", "level": "advanced"},
+    {"role": "Founder", "goal": "draft a pitch deck", "level": "intermediate"},
+    {"role": "Teacher", "goal": "plan lessons", "level": "beginner"},
+]
+SAMPLE_FEEDBACK = [
+    None,
+    "Did not specify an output format.",
+    "The prompt had no role or context.",
+    "Constraints were vague.",
+]
+
+
+def get_tokenizer():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return encoding.encode, "tiktoken o200k_base"
+    except Exception:
+        pattern = re.compile(r"\w+|[^\w\s]|\s+")
+        return pattern.findall, "approximate (words/punctuation)"
+
+
+def legacy_task_messages(track, lesson_index, task_no, previous_feedback=None, preferences=None):
+    """The previous layout: per-user state between the lesson block and the static rules"""
+    rules = task_prompt.MENTOR_RULES.replace("You are an AI Learning Mentor.\n", "")
+    system_prompt = (
+        "You are an AI Learning Mentor.\n"
+        + task_prompt.lesson_block(track, lesson_index)
+        + "\n" + task_prompt.user_state_block(task_no, previous_feedback, preferences)
+        + "\n" + rules
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": task_prompt.TASK_REQUEST}
+    ]
+
+
+def synthetic_log(count):
+    tracks = curriculum_registry.registry.tracks()
+    requests = []
+    for _ in range(count):
+        track = random.choice(tracks)
+        curriculum = curriculum_registry.registry.get(track)
+        requests.append({
+            "track": track,
+            "lesson_index": random.randrange(max(1, curriculum.lesson_count)),
+            "task_no": random.randint(1, curriculum_registry.TASKS_PER_LESSON),
+            "preferences": random.choice(SAMPLE_PREFERENCES),
+            "previous_feedback": random.choice(SAMPLE_FEEDBACK),
+        })
+    return requests
+
+
+class PrefixCache:
+    """Token trie of every prompt seen so far"""
+
+    def __init__(self):
+        self.root = {}
+
+    def lookup_and_insert(self, tokens):
+        node, matched, matching = self.root, 0, True
+        for token in tokens:
+            if matching and token in node:
+                matched += 1
+            else:
+                matching = False
+            node = node.setdefault(token, {})
+        return matched
+
+
+def billable_cached(matched, total):
+    if total < CACHE_MIN_TOKENS or matched < CACHE_MIN_TOKENS:
+        return 0
+    return matched - matched % CACHE_INCREMENT
+
+
+def replay(name, build_messages, requests, tokenize, verbose):
+    cache = PrefixCache()
+    totals, matched, billable = [], [], []
+    for request in requests:
+        messages = build_messages(
+            request["track"], request.get("lesson_index", 0), request.get("task_no", 1),
+            request.get("previous_feedback"), request.get("preferences")
+        )
+        # Roughly how chat templates serialize messages before tokenizing
+        text = "".join(f"<|{message['role']}|>{message['content']}<|end|>" for message in messages)
+        tokens = tokenize(text)
+        hit = cache.lookup_and_insert(tokens)
+        totals.append(len(tokens))
+        matched.append(hit)
+        billable.append(billable_cached(hit, len(tokens)))
+        if verbose:
+            print(f"   {name:<8} {request['track']:<12} lesson={request.get('lesson_index', 0)} tokens={len(tokens):5} prefix hit={hit:5}")
+
+    print(f"📊 {name}: {len(requests)} calls")
+    print(f"   prompt tokens      p50={statistics.median(totals):7.0f}  max={max(totals):7}")
+    print(f"   stable prefix      {sum(matched) / sum(totals):7.1%} of prompt tokens already seen")
+    print(f"   cacheable (>={CACHE_MIN_TOKENS}, {CACHE_INCREMENT}-token steps) {sum(billable) / sum(totals):7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--log", help="JSONL request log to replay (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=500, help="synthetic requests when no log is given")
+    parser.add_argument("--verbose", action="store_true", help="print every call")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+    else:
+        random.seed(42)
+        requests = synthetic_log(args.requests)
+
+    tokenize, tokenizer_name = get_tokenizer()
+    print(f"🔄 Tokenizer: {tokenizer_name}")
+    replay("legacy", legacy_task_messages, requests, tokenize, args.verbose)
+    replay("current", task_prompt.build_task_messages, requests, tokenize, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
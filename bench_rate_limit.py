@@ -0,0 +1,81 @@
+"""
+Rate limiter burst simulation (in-memory store, no server needed)
+One scripted client fires a large burst while many students each send a few requests.
+Reports, per group, how many requests were admitted, queued or rejected and how long they
+waited; the global admission rate against the configured budget; and Jain's fairness index
+of admissions across the light users (1.0 = perfectly even).
+Run: python bench_rate_limit.py [--light-users 30] [--heavy-requests 100]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import ratelimit
+
+
+async def client(limiter, user_id, results, delay=0.0):
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    try:
+        await limiter.acquire(user_id)
+        results.append((user_id, True, time.perf_counter() - start, time.perf_counter()))
+    except ratelimit.RateLimited:
+        results.append((user_id, False, time.perf_counter() - start, time.perf_counter()))
+
+
+def jain_index(values):
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values)) if any(values) else 1.0
+
+
+def report(name, rows):
+    admitted = [row for row in rows if row[1]]
+    waits = [row[2] for row in admitted] or [0.0]
+    print(f"   {name:<6} requests={len(rows):>4}  admitted={len(admitted):>4}  rejected={len(rows) - len(admitted):>4}  "
+          f"wait p50={statistics.median(waits):5.2f}s  max={max(waits):5.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--light-users", type=int, default=30)
+    parser.add_argument("--light-requests", type=int, default=3)
+    parser.add_argument("--heavy-requests", type=int, default=100)
+    parser.add_argument("--user-per-minute", type=float, default=60)
+    parser.add_argument("--user-burst", type=float, default=3)
+    parser.add_argument("--global-per-minute", type=float, default=1200)
+    parser.add_argument("--global-burst", type=float, default=10)
+    parser.add_argument("--queue-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    limiter = ratelimit.RateLimiter(
+        ratelimit.MemoryStore(), args.user_per_minute, args.user_burst,
+        args.global_per_minute, args.global_burst, args.queue_seconds, enabled=True
+    )
+    print(f"🔄 user {args.user_per_minute:.0f}/min (burst {args.user_burst:.0f}), global {args.global_per_minute:.0f}/min "
+          f"(burst {args.global_burst:.0f}), queue {args.queue_seconds:.0f}s")
+    print(f"   1 heavy user x {args.heavy_requests} requests, then {args.light_users} users x {args.light_requests} requests")
+
+    results = []
+    start = time.perf_counter()
+    clients = [client(limiter, "heavy", results) for _ in range(args.heavy_requests)]
+    clients += [
+        client(limiter, f"light-{i}", results, delay=0.1)
+        for i in range(args.light_users) for _ in range(args.light_requests)
+    ]
+    await asyncio.gather(*clients)
+
+    report("heavy", [row for row in results if row[0] == "heavy"])
+    report("light", [row for row in results if row[0] != "heavy"])
+
+    admitted_at = [row[3] - start for row in results if row[1]]
+    span = max(admitted_at) - min(admitted_at) if len(admitted_at) > 1 else 0.0
+    budget = args.global_burst + span * args.global_per_minute / 60
+    print(f"   global admitted={len(admitted_at)} over {span:.2f}s (budget for that span: {budget:.0f})")
+
+    per_user = [sum(1 for row in results if row[0] == f"light-{i}" and row[1]) for i in range(args.light_users)]
+    print(f"   light users admitted per user min={min(per_user)} max={max(per_user)}  Jain fairness={jain_index(per_user):.3f}")
+    print(f"   {limiter.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional
+
+from dotenv import load_dotenv
+
+import database
+
+load_dotenv()
+
+# Evaluation cache settings
+EVAL_CACHE_SIZE = int(os.getenv("EVAL_CACHE_SIZE", "2048"))
+EVAL_CACHE_TTL_SECONDS = int(os.getenv("EVAL_CACHE_TTL_SECONDS", "86400"))
+EVAL_CACHE_MONGO = os.getenv("EVAL_CACHE_MONGO", "false").lower() in ("1", "true", "yes")
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        """Invalidate a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different resubmissions share a key"""
+    return " ".join(text.split())
+
+
+class EvaluationCache:
+    """
+    Content-addressed cache of LLM evaluations.
+    Keys are a hash of the fully built evaluation messages plus the model name,
+    served from an in-process LRU first and an optional Mongo tier second.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int, use_mongo: bool = False):
+        self.memory = TTLCache(maxsize, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self.mongo_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: str) -> str:
+        normalized = [
+            {"role": message["role"], "content": normalize_text(message["content"])}
+            for message in messages
+        ]
+        payload = json.dumps({"model": model, "messages": normalized}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        evaluation = self.memory.get(key)
+        if evaluation is not None:
+            return evaluation
+
+        if self.use_mongo:
+            db = database.get_database()
+            doc = await db.evaluation_cache.find_one({"_id": key})
+            if doc is not None:
+                self.mongo_hits += 1
+                self.memory.set(key, doc["evaluation"])
+                return doc["evaluation"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, evaluation: str, model: str):
+        self.memory.set(key, evaluation)
+
+        if self.use_mongo:
+            db = database.get_database()
+            await db.evaluation_cache.update_one(
+                {"_id": key},
+                {"$set": {"evaluation": evaluation, "model": model, "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory.hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "memory": self.memory.stats(),
+            "mongo_enabled": self.use_mongo,
+            "mongo_hits": self.mongo_hits,
+            "hits": hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+evaluation_cache = EvaluationCache(EVAL_CACHE_SIZE, EVAL_CACHE_TTL_SECONDS, EVAL_CACHE_MONGO)
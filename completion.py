@@ -0,0 +1,175 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+import curriculum_registry
+import database
+import evaluation
+import heatmap
+import stats
+
+load_dotenv()
+
+# Run the completion writes in one multi-document transaction (requires a replica set, e.g. Atlas)
+MONGO_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "false").lower() in ("1", "true", "yes")
+
+
+class TaskAlreadyCompleted(Exception):
+    """The (user, track, task) completion already exists"""
+
+
+class InvalidCompletion(ValueError):
+    """A completion field that should be a number isn't one"""
+
+
+def _number(completion_data: Dict[str, Any], name: str, default: Any, cast=int) -> Any:
+    """
+    A client-supplied number as a plain int/float. Values go into update pipelines, where
+    a string like "$stats.total_xp" would otherwise be read as a field path.
+    """
+    value = completion_data.get(name, default)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise InvalidCompletion(f"{name} must be a number")
+    try:
+        return cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidCompletion(f"{name} must be a number")
+
+
+def calculate_progress_percentage(track_slug: str, tasks_completed: int) -> float:
+    curriculum = curriculum_registry.registry.get(track_slug)
+    if curriculum is not None and curriculum.total_tasks > 0:
+        return min(100.0, (tasks_completed / curriculum.total_tasks) * 100)
+    # Fallback
+    return min(100.0, tasks_completed * 6.6)
+
+
+def progress_percentage_expr(track_slug: str, tasks_completed_expr: Any) -> Dict[str, Any]:
+    """calculate_progress_percentage as an aggregation expression, for update pipelines"""
+    curriculum = curriculum_registry.registry.get(track_slug)
+    if curriculum is not None and curriculum.total_tasks > 0:
+        return {"$min": [100.0, {"$multiply": [{"$divide": [tasks_completed_expr, curriculum.total_tasks]}, 100]}]}
+    return {"$min": [100.0, {"$multiply": [tasks_completed_expr, 6.6]}]}
+
+
+def build_completion_writes(user_id: str, task_id: str, completion_data: Dict[str, Any], now: datetime):
+    """The task_completions document plus the follow-up updates for users, track_progress and daily_activities"""
+    track_slug = completion_data.get("track_slug")
+    xp_earned = _number(completion_data, "xp_earned", 10)
+    time_spent_minutes = _number(completion_data, "time_spent_minutes", 0, cast=float)
+    task_index = _number(completion_data, "task_index", None)
+    lesson_index = _number(completion_data, "lesson_index", None)
+
+    # Score and summary come from the client when it has them, otherwise from the evaluation text
+    ai_evaluation = completion_data.get("ai_evaluation", "")
+    parsed = evaluation.parse_evaluation(ai_evaluation) if ai_evaluation else {}
+    score = completion_data.get("score")
+    if score is None:
+        score = parsed.get("score")
+
+    task_dict = {
+        "user_id": user_id,
+        "track_slug": track_slug,
+        "task_id": task_id,
+        "task_text": completion_data.get("task_text"),
+        "lesson_index": lesson_index,
+        "task_index": task_index,
+        "prompt": completion_data.get("prompt", ""),
+        "user_output": completion_data.get("user_output", ""),
+        "ai_evaluation": ai_evaluation,
+        "completed_at": now,
+        "score": score,
+        "feedback_summary": completion_data.get("feedback_summary") or parsed.get("feedback_summary"),
+        "xp_earned": xp_earned,
+        "time_spent_minutes": time_spent_minutes
+    }
+
+    # Totals, streak and the rolling activity window are maintained on the user document
+    user_update = stats.activity_update(xp_earned, time_spent_minutes, now)
+
+    # Progress is computed server-side from the stored counter instead of read-then-write
+    current_task_idx = 1 if "task_index" not in completion_data else task_index
+    current_lesson_idx = 0 if "lesson_index" not in completion_data else lesson_index
+    tasks_completed = {"$add": [{"$ifNull": ["$tasks_completed", 0]}, 1]}
+
+    progress_fields = {
+        "tasks_completed": tasks_completed,
+        "last_accessed": now,
+        "current_task_index": current_task_idx,
+        "percent_complete": progress_percentage_expr(track_slug, tasks_completed)
+    }
+
+    # Check if lesson is completed (3 tasks per lesson logic)
+    if current_task_idx is not None and current_task_idx >= curriculum_registry.TASKS_PER_LESSON:
+        progress_fields["lessons_completed"] = {"$add": [{"$ifNull": ["$lessons_completed", 0]}, 1]}
+        progress_fields["current_lesson_index"] = (current_lesson_idx or 0) + 1
+        progress_fields["current_task_index"] = 0  # Reset for next lesson
+
+    progress_update = [{"$set": progress_fields}]
+
+    today = stats.start_of_day(now)
+    activity_filter = {"user_id": user_id, "activity_date": today}
+    activity_update = {
+        "$inc": {
+            "tasks_completed": 1,
+            "xp_earned": xp_earned,
+            "time_spent_minutes": time_spent_minutes
+        }
+    }
+
+    return task_dict, user_update, progress_update, activity_filter, activity_update
+
+
+async def record_completion(user_id: str, task_id: str, completion_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record a task completion and apply its side effects.
+    The unique (user_id, track_slug, task_id) index rejects duplicates, so there is no pre-check read.
+    """
+    task_completions = database.get_collection("task_completions")
+    users = database.get_collection("users")
+    track_progress = database.get_collection("track_progress")
+    daily_activities = database.get_collection("daily_activities")
+    now = datetime.utcnow()
+    task_dict, user_update, progress_update, activity_filter, activity_update = build_completion_writes(
+        user_id, task_id, completion_data, now
+    )
+    progress_filter = {"user_id": user_id, "track_slug": task_dict["track_slug"]}
+
+    if MONGO_TRANSACTIONS:
+        async def write_all(session):
+            result = await task_completions.insert_one(task_dict, session=session)
+            await users.update_one(stats.user_filter(user_id), user_update, session=session)
+            await track_progress.update_one(progress_filter, progress_update, session=session)
+            await daily_activities.update_one(activity_filter, activity_update, upsert=True, session=session)
+            return result
+
+        try:
+            async with await database.client.start_session() as session:
+                result = await session.with_transaction(write_all)
+        except DuplicateKeyError:
+            raise TaskAlreadyCompleted()
+
+        # The heatmap is derived from daily_activities; its first write of a year may hit a
+        # DuplicateKeyError on the year document, which would abort the transaction
+        await heatmap.record_activity(user_id, task_dict["xp_earned"], now)
+    else:
+        try:
+            result = await task_completions.insert_one(task_dict)
+        except DuplicateKeyError:
+            raise TaskAlreadyCompleted()
+
+        await asyncio.gather(
+            users.update_one(stats.user_filter(user_id), user_update),
+            track_progress.update_one(progress_filter, progress_update),
+            daily_activities.update_one(activity_filter, activity_update, upsert=True),
+            heatmap.record_activity(user_id, task_dict["xp_earned"], now)
+        )
+
+    task_dict["_id"] = result.inserted_id
+    return task_dict
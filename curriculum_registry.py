@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CURRICULUM_DIR = os.getenv("CURRICULUM_DIR", "curriculum")
+# How often a track's file is stat'ed for changes
+CURRICULUM_RELOAD_INTERVAL_SECONDS = float(os.getenv("CURRICULUM_RELOAD_INTERVAL_SECONDS", "2"))
+
+# Track slugs are file names in CURRICULUM_DIR; anything else (paths, "..") is never looked up
+TRACK_SLUG = re.compile(r"[a-z0-9-]+")
+
+# 3 tasks per lesson logic
+TASKS_PER_LESSON = 3
+
+# Evaluation criteria, matched against lesson titles
+LESSON_CRITERIA = [
+    ("Understanding LLM Behavior", "Identify differences in tone, detail, and structure. Explain why prompt wording changes output."),
+    ("Core Prompting Techniques", "Effectively use Role Prompting, Zero-shot, or Few-shot techniques. Output quality improves vs basic prompt."),
+    ("Prompt Structure Framework", "Includes Role, clear Task, Constraints, and Output Format."),
+    ("Iteration & Refinement", "Uses follow-up prompts. Output improves progressively."),
+    ("Real-World Applications", "Prompt is well-structured and output is usable in real life."),
+    ("Advanced Prompting", "Leverages AI as collaborator. Uses multi-step prompting. Breaks problems into steps."),
+]
+DEFAULT_CRITERIA = "Persona, Context, Clear Task, Examples, Iteration"
+
+
+def criteria_for_lesson(lesson_title: str) -> str:
+    """Evaluation criteria for a lesson title"""
+    for title_fragment, criteria in LESSON_CRITERIA:
+        if title_fragment in lesson_title:
+            return criteria
+    return DEFAULT_CRITERIA
+
+
+class Curriculum:
+    """A parsed track curriculum with precomputed lookups"""
+
+    def __init__(self, slug: str, data: Dict[str, Any], mtime: float):
+        self.slug = slug
+        self.data = data
+        self.mtime = mtime
+        self.name = data.get("track", slug)
+        self.lessons: List[Dict[str, Any]] = data.get("lessons", [])
+        self.tasks: List[Dict[str, Any]] = data.get("tasks", [])
+        self.lesson_count = len(self.lessons)
+        self.total_tasks = self.lesson_count * TASKS_PER_LESSON
+        self.criteria_by_title = {
+            lesson["title"]: criteria_for_lesson(lesson["title"]) for lesson in self.lessons
+        }
+
+    def lesson(self, lesson_index: int) -> Dict[str, Any]:
+        """Lesson at an index, falling back to the first lesson"""
+        try:
+            return self.lessons[lesson_index]
+        except IndexError:
+            return self.lessons[0]
+
+    def criteria(self, lesson_title: str) -> str:
+        criteria = self.criteria_by_title.get(lesson_title)
+        return criteria if criteria is not None else criteria_for_lesson(lesson_title)
+
+
+class CurriculumRegistry:
+    """
+    Loads each curriculum/{track}.json once and keeps it in memory.
+    A file is re-parsed only when its mtime changes.
+    """
+
+    def __init__(self, directory: str, reload_interval: float):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._curricula: Dict[str, Curriculum] = {}
+        self._checked_at: Dict[str, float] = {}
+
+    def _path(self, track: str) -> str:
+        return os.path.join(self.directory, f"{track}.json")
+
+    def _load(self, track: str) -> Optional[Curriculum]:
+        path = self._path(track)
+        try:
+            mtime = os.stat(path).st_mtime
+        except (FileNotFoundError, NotADirectoryError):
+            self._curricula.pop(track, None)
+            return None
+
+        current = self._curricula.get(track)
+        if current is not None and current.mtime == mtime:
+            return current
+
+        try:
+            with open(path) as f:
+                curriculum = Curriculum(track, json.load(f), mtime)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load curriculum for {track}: {e}")
+            return current
+
+        self._curricula[track] = curriculum
+        return curriculum
+
+    def get(self, track: str) -> Optional[Curriculum]:
+        """Get a track's curriculum, or None if it has no curriculum file"""
+        if not isinstance(track, str) or not TRACK_SLUG.fullmatch(track):
+            return None
+        now = time.monotonic()
+        if now - self._checked_at.get(track, float("-inf")) < self.reload_interval:
+            return self._curricula.get(track)
+
+        curriculum = self._load(track)
+        if curriculum is None:
+            # Don't remember misses: arbitrary client-supplied slugs would grow this forever
+            self._checked_at.pop(track, None)
+        else:
+            self._checked_at[track] = now
+        return curriculum
+
+    def load_all(self):
+        """Load every curriculum file in the directory"""
+        try:
+            filenames = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            logger.warning(f"Curriculum directory {self.directory} not found")
+            return
+
+        for filename in filenames:
+            if filename.endswith(".json"):
+                self.get(filename[:-len(".json")])
+
+    def tracks(self) -> List[str]:
+        return sorted(self._curricula)
+
+
+registry = CurriculumRegistry(CURRICULUM_DIR, CURRICULUM_RELOAD_INTERVAL_SECONDS)
+registry.load_all()
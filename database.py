@@ -1,17 +1,158 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
 from pymongo.server_api import ServerApi
+from pymongo.write_concern import WriteConcern
+from pydantic import BaseModel
+from typing import Dict, List, Optional
 import os
+import threading
 from dotenv import load_dotenv
 
+import metrics
+import write_behind
+
 load_dotenv()
 
 # MongoDB connection settings
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "aiboomi_mentora")
 
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _env_list(name: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+def _env_mapping(name: str) -> Dict[str, str]:
+    """Parse "collection=value,collection=value" settings"""
+    mapping = {}
+    for item in _env_list(name):
+        collection, _, value = item.partition("=")
+        mapping[collection.strip()] = value.strip()
+    return mapping
+
+
+class MongoSettings(BaseModel):
+    """Connection pool, timeout, compression and per-collection read/write settings"""
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 10000
+    socket_timeout_ms: Optional[int] = None
+    compressors: List[str] = []
+    # e.g. {"track_progress": "secondaryPreferred"}
+    read_preferences: Dict[str, str] = {}
+    # e.g. {"daily_activities": "1", "task_completions": "majority"}
+    write_concerns: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        values = {
+            "max_pool_size": _env_int("MONGO_MAX_POOL_SIZE"),
+            "min_pool_size": _env_int("MONGO_MIN_POOL_SIZE"),
+            "max_idle_time_ms": _env_int("MONGO_MAX_IDLE_TIME_MS"),
+            "wait_queue_timeout_ms": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+            "server_selection_timeout_ms": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+            "connect_timeout_ms": _env_int("MONGO_CONNECT_TIMEOUT_MS"),
+            "socket_timeout_ms": _env_int("MONGO_SOCKET_TIMEOUT_MS"),
+            "compressors": _env_list("MONGO_COMPRESSORS"),
+            "read_preferences": _env_mapping("MONGO_READ_PREFERENCES"),
+            "write_concerns": _env_mapping("MONGO_WRITE_CONCERNS"),
+        }
+        return cls(**{name: value for name, value in values.items() if value is not None})
+
+    def client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms,
+        }
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        return {name: value for name, value in options.items() if value is not None}
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks checked-out connections and checkout wait times, for sizing pools per worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_checked_out(self, event):
+        wait = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": self.total_wait_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "pool_clears": self.pool_clears,
+            }
+
+
+settings = MongoSettings.from_env()
+pool_monitor = PoolMonitor()
+
 # Global MongoDB client and database
 client = None
 database = None
+_collections = {}
 
 
 async def connect_to_mongo():
@@ -21,8 +162,11 @@ async def connect_to_mongo():
     try:
         client = AsyncIOMotorClient(
             MONGODB_URL,
-            server_api=ServerApi('1')
+            server_api=ServerApi('1'),
+            event_listeners=[pool_monitor, metrics.mongo_command_monitor],
+            **settings.client_options()
         )
+        _collections.clear()
         
         # Test the connection
         await client.admin.command('ping')
@@ -33,6 +177,9 @@ async def connect_to_mongo():
         # Create indexes
         await create_indexes()
         
+        # Start flushing deferred touch-style writes
+        write_behind.queue.start(database)
+        
     except Exception as e:
         print(f"❌ Error connecting to MongoDB: {e}")
         raise
@@ -41,6 +188,10 @@ async def connect_to_mongo():
 async def close_mongo_connection():
     """Close MongoDB connection"""
     global client
+    
+    # Drain deferred writes before the connection goes away
+    await write_behind.queue.stop()
+    
     if client:
         client.close()
         print("✅ MongoDB connection closed")
@@ -54,6 +205,7 @@ async def create_indexes():
         # Users collection indexes
         await database.users.create_index("username", unique=True)
         await database.users.create_index("email", unique=True)
+        await database.users.create_index([("stats.total_xp", -1)])
         
         # Track progress indexes
         await database.track_progress.create_index([("user_id", 1), ("track_slug", 1)], unique=True)
@@ -64,11 +216,41 @@ async def create_indexes():
         await database.task_completions.create_index([("user_id", 1), ("track_slug", 1), ("task_id", 1)], unique=True)
         await database.task_completions.create_index("user_id")
         await database.task_completions.create_index("track_slug")
+        await database.task_completions.create_index([("user_id", 1), ("track_slug", 1), ("completed_at", 1), ("_id", 1)])
+        # Leaderboard rebuilds: covered $group scans for per-track and weekly totals
+        await database.task_completions.create_index([("track_slug", 1), ("user_id", 1), ("xp_earned", 1)])
+        await database.task_completions.create_index([("completed_at", 1), ("track_slug", 1), ("user_id", 1), ("xp_earned", 1)])
         
         # Daily activities indexes
         await database.daily_activities.create_index([("user_id", 1), ("activity_date", 1)], unique=True)
         await database.daily_activities.create_index("user_id")
         
+        # Activity heatmaps (one document per user per year)
+        await database.activity_heatmaps.create_index([("user_id", 1), ("year", 1)], unique=True)
+        
+        # Evaluation cache entries expire on their own
+        await database.evaluation_cache.create_index(
+            "created_at",
+            expireAfterSeconds=int(os.getenv("EVAL_CACHE_TTL_SECONDS", "86400"))
+        )
+        
+        # Tasks shown to users, looked up by taskId when grading; they expire after a week by default
+        await database.generated_tasks.create_index(
+            "created_at",
+            expireAfterSeconds=int(os.getenv("GENERATED_TASK_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+        await database.generated_tasks.create_index("prompt_hash")
+        
+        # Pre-generated task pool, stale tasks expire after a week by default
+        await database.task_pool.create_index([("bucket", 1), ("created_at", 1)])
+        await database.task_pool.create_index(
+            "created_at",
+            expireAfterSeconds=int(os.getenv("TASK_POOL_TTL_SECONDS", "604800"))
+        )
+        
+        # Shared rate limit buckets (RATE_LIMIT_STORE=mongo); idle ones are refilled anyway, so they can go
+        await database.rate_limits.create_index("updated_at", expireAfterSeconds=3600)
+        
         print("✅ Database indexes created successfully")
         
     except Exception as e:
@@ -78,3 +260,20 @@ async def create_indexes():
 def get_database():
     """Get database instance"""
     return database
+
+
+def get_collection(name: str):
+    """Get a collection with its configured read preference and write concern"""
+    collection = _collections.get(name)
+    if collection is None:
+        options = {}
+        if name in settings.read_preferences:
+            options["read_preference"] = make_read_preference(
+                read_pref_mode_from_name(settings.read_preferences[name]), None
+            )
+        if name in settings.write_concerns:
+            w = settings.write_concerns[name]
+            options["write_concern"] = WriteConcern(w=int(w) if w.isdigit() else w)
+        collection = database.get_collection(name, **options) if options else database[name]
+        _collections[name] = collection
+    return collection
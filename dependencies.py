@@ -2,12 +2,29 @@ from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from bson import ObjectId
+import math
+import os
 import auth
+import cache
 import database
 import models
+import ratelimit
 
 security = OAuth2PasswordBearer(tokenUrl="token")
 
+# Short-lived cache of authenticated users, so a page load doesn't hit Mongo once per call
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+user_cache = cache.TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+# Usernames allowed to call instructor/admin endpoints (comma separated)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a cached user after writing to their users document"""
+    user_cache.pop(str(user_id))
+
 
 async def get_current_user(
     token: str = Depends(security)
@@ -31,6 +48,10 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user.model_copy()
+    
     # Get user from database
     db = database.get_database()
     user_data = await db.users.find_one({"_id": ObjectId(user_id)})
@@ -41,7 +62,42 @@ async def get_current_user(
     # Convert ObjectId to string for Pydantic model
     user_data["_id"] = str(user_data["_id"])
     
-    return models.UserInDB(**user_data)
+    user = models.UserInDB(**user_data)
+    user_cache.set(user_id, user)
+    
+    return user.model_copy()
+
+
+async def get_admin_user(
+    current_user: models.UserInDB = Depends(get_current_user)
+) -> models.UserInDB:
+    """
+    Dependency for admin-only endpoints (users listed in ADMIN_USERNAMES)
+    """
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
+async def get_rate_limited_user(
+    current_user: models.UserInDB = Depends(get_current_user)
+) -> models.UserInDB:
+    """
+    Dependency for LLM-backed endpoints: waits for the user's turn under the per-user and
+    global rate limits, or answers 429 with Retry-After when the wait would be too long
+    """
+    try:
+        await ratelimit.limiter.acquire(current_user.id)
+    except ratelimit.RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    return current_user
 
 
 async def get_current_user_optional(
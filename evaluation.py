@@ -0,0 +1,262 @@
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import openai
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError, field_validator
+
+import curriculum_registry
+import llm
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Ask the model for JSON matching EVALUATION_SCHEMA instead of the free-text format
+EVAL_STRUCTURED_OUTPUT = os.getenv("EVAL_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
+
+class EvaluationRefused(Exception):
+    """The model returned no content (a strict-schema refusal, or an empty reply)"""
+
+
+class EvaluationResult(BaseModel):
+    """A graded submission"""
+    score: Optional[int] = None  # 0-10, None if the model's reply had no score
+    strengths: List[str] = []
+    misses: List[str] = []
+    improvements: List[str] = []
+    summary: Optional[str] = None  # one sentence on the main mistake, stored as feedback_summary
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def clamp_score(cls, value):
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"score must be a number, got {value!r}")
+        try:
+            score = float(value)
+        except ValueError:
+            raise ValueError(f"score must be a number, got {value!r}")
+        if not math.isfinite(score):
+            raise ValueError(f"score must be finite, got {value!r}")
+        return max(0, min(10, round(score)))
+
+    @field_validator("summary", mode="before")
+    @classmethod
+    def empty_summary(cls, value):
+        if value is None:
+            return None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            raise ValueError(f"summary must be a string, got {value!r}")
+        return value.strip() or None
+
+
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "description": "Score out of 10"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "misses": {"type": "array", "items": {"type": "string"}},
+        "improvements": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string"},
+    },
+    "required": ["score", "strengths", "misses", "improvements", "summary"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "evaluation", "strict": True, "schema": EVALUATION_SCHEMA},
+}
+
+TEXT_FORMAT = """Evaluate. Format exactly like this:
+
+Score: X/10
+
+What You Did Well:
+- ...
+
+What You Missed:
+- (Crucial: List 1-2 specific missing concepts)
+
+How To Improve:
+- ...
+
+Feedback Summary:
+(One short sentence summarizing the main mistake for the database)
+"""
+
+JSON_FORMAT = """Evaluate. Reply with a JSON object with these fields:
+- score: integer from 0 to 10
+- strengths: what the student did well, as short bullet points
+- misses: 1-2 specific missing concepts (crucial)
+- improvements: how to improve, as short bullet points
+- summary: one short sentence summarizing the main mistake for the database
+"""
+
+# Section headings of TEXT_FORMAT and the result field each one fills
+TEXT_SECTIONS = {
+    "what you did well": "strengths",
+    "what you missed": "misses",
+    "how to improve": "improvements",
+    "feedback summary": "summary",
+}
+
+
+def build_evaluation_prompt(user_prompt, user_output, lesson_title, task_text, criteria=None, structured=False):
+    if criteria is None:
+        criteria = curriculum_registry.criteria_for_lesson(lesson_title)
+
+    return f"""
+You are a friendly AI Mentor evaluating a student.
+TASK: {task_text}
+LESSON: {lesson_title}
+CRITERIA: {criteria}
+
+USER PROMPT: {user_prompt}
+LLM OUTPUT: {user_output}
+
+{JSON_FORMAT if structured else TEXT_FORMAT}"""
+
+
+def _json_object(text: str) -> Optional[Dict[str, Any]]:
+    """The reply as one JSON object: the whole stripped reply, or the body of a ``` fence around all of it"""
+    text = text.strip()
+    fence = re.fullmatch(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL | re.IGNORECASE)
+    if fence:
+        text = fence.group(1)
+    if not text.startswith("{"):
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _parse_json(text: str) -> Optional[EvaluationResult]:
+    # A text-format evaluation may quote JSON (a code example); only a reply that is
+    # nothing but an evaluation object counts as structured
+    data = _json_object(text)
+    if data is None or "score" not in data:
+        return None
+    try:
+        return EvaluationResult.model_validate(data)
+    except ValidationError:
+        return None
+
+
+def _parse_text(text: str) -> EvaluationResult:
+    """Tolerant parser for the TEXT_FORMAT layout: missing sections are left empty"""
+    fields: Dict[str, Any] = {}
+    score_match = re.search(r"Score:\s*(\d+(?:\.\d+)?)\s*/\s*10", text, re.IGNORECASE)
+    if score_match:
+        fields["score"] = score_match.group(1)
+
+    heading = re.compile(r"^\W*(" + "|".join(TEXT_SECTIONS) + r")\W*:\W*(.*)$", re.IGNORECASE)
+    section = None
+    lines: Dict[str, List[str]] = {}
+    for line in text.splitlines():
+        match = heading.match(line.strip())
+        if match:
+            section = TEXT_SECTIONS[match.group(1).lower()]
+            line = match.group(2)
+        if section is not None and line.strip():
+            lines.setdefault(section, []).append(line.strip().lstrip("-*• ").strip())
+
+    for section, items in lines.items():
+        items = [item for item in items if item]
+        if section == "summary":
+            fields["summary"] = " ".join(items) or None
+        else:
+            fields[section] = items
+
+    return EvaluationResult(**fields)
+
+
+def parse_evaluation_result(text: str) -> EvaluationResult:
+    """Parse a structured (JSON) evaluation, falling back to the free-text format"""
+    if not text:
+        return EvaluationResult()
+    return _parse_json(text) or _parse_text(text)
+
+
+def parse_evaluation(evaluation: str):
+    """Extract the score and feedback summary from an evaluation (JSON or the text format)"""
+    result = parse_evaluation_result(evaluation)
+    return {"score": result.score, "feedback_summary": result.summary}
+
+
+def render_evaluation(result: EvaluationResult) -> str:
+    """The evaluation as display text, in TEXT_FORMAT"""
+    def bullets(items):
+        return "\n".join(f"- {item}" for item in items) or "- (none)"
+
+    score = f"{result.score}/10" if result.score is not None else "?/10"
+    return (
+        f"Score: {score}\n\n"
+        f"What You Did Well:\n{bullets(result.strengths)}\n\n"
+        f"What You Missed:\n{bullets(result.misses)}\n\n"
+        f"How To Improve:\n{bullets(result.improvements)}\n\n"
+        f"Feedback Summary:\n{result.summary or ''}"
+    )
+
+
+def evaluation_response(result: EvaluationResult) -> Dict[str, Any]:
+    """Display text plus the typed fields, as returned by the evaluate endpoints"""
+    return {"evaluation": render_evaluation(result), **result.model_dump(), "feedback_summary": result.summary}
+
+
+def lesson_context(track, lesson_index):
+    """Lesson title and grading criteria for a track's lesson, falling back to the chatgpt track"""
+    target_curriculum = curriculum_registry.registry.get(track) or curriculum_registry.registry.get("chatgpt")
+    try:
+        lesson_title = target_curriculum.lessons[lesson_index]["title"]
+        return lesson_title, target_curriculum.criteria(lesson_title)
+    except:
+        return "General Practice", None
+
+
+def evaluation_messages(
+    user_prompt, user_output, track, lesson_index, task_text="User's current task", structured=None
+):
+    if structured is None:
+        structured = EVAL_STRUCTURED_OUTPUT
+    lesson_title, criteria = lesson_context(track, lesson_index)
+    eval_prompt = build_evaluation_prompt(user_prompt, user_output, lesson_title, task_text, criteria, structured)
+    return [{"role": "user", "content": eval_prompt}]
+
+
+async def request_evaluation(messages: List[Dict[str, str]], max_retries: Optional[int] = None) -> EvaluationResult:
+    """
+    Grade with JSON-schema structured output. If the provider or model rejects response_format,
+    this call is retried with the same prompt as plain text, parsed by the tolerant parser.
+    Raises EvaluationRefused when the model returns no content.
+    """
+    text = None
+    structured = EVAL_STRUCTURED_OUTPUT
+    if structured:
+        try:
+            text = await llm.chat_completion(
+                messages, max_retries=max_retries, response_format=RESPONSE_FORMAT, route=llm.EVALUATE
+            )
+        except openai.BadRequestError as e:
+            if "response_format" not in str(e) and "json_schema" not in str(e):
+                raise
+            logger.warning(f"Structured evaluation output rejected, retrying this call in the text format: {e}")
+            structured = False
+
+    if not structured:
+        text = await llm.chat_completion(messages, max_retries=max_retries, route=llm.EVALUATE)
+
+    if not text:
+        raise EvaluationRefused("The model returned no evaluation (refused or empty reply)")
+    return parse_evaluation_result(text)
@@ -0,0 +1,123 @@
+"""
+Local fake OpenAI-compatible LLM server for load tests and benchmarks
+Run it with: uvicorn fake_llm_server:app --port 9100
+create_app() builds extra instances with their own latency and failure injection,
+e.g. a slow or failing primary next to a healthy backup for the LLM gateway benchmark.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated model latency per completion, plus up to this much uniform jitter
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "500"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "0"))
+# Fraction of requests that take FAKE_LLM_SLOW_LATENCY_MS instead (tail latency)
+FAKE_LLM_SLOW_RATIO = float(os.getenv("FAKE_LLM_SLOW_RATIO", "0"))
+FAKE_LLM_SLOW_LATENCY_MS = float(os.getenv("FAKE_LLM_SLOW_LATENCY_MS", "5000"))
+# Delay between streamed tokens when the client asks for stream=True
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "20"))
+# Fraction of requests answered with 429 Too Many Requests, and the Retry-After sent with them
+FAKE_LLM_RATE_LIMIT_RATIO = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATIO", "0"))
+FAKE_LLM_RETRY_AFTER_SECONDS = float(os.getenv("FAKE_LLM_RETRY_AFTER_SECONDS", "1"))
+# Fraction of requests answered with 500 Internal Server Error
+FAKE_LLM_ERROR_RATIO = float(os.getenv("FAKE_LLM_ERROR_RATIO", "0"))
+
+FAKE_CONTENT = "Score: 7/10\n\nFeedback Summary:\nFake evaluation from the local LLM server."
+
+
+def create_app(
+    latency_ms: float = FAKE_LLM_LATENCY_MS,
+    jitter_ms: float = FAKE_LLM_JITTER_MS,
+    slow_ratio: float = FAKE_LLM_SLOW_RATIO,
+    slow_latency_ms: float = FAKE_LLM_SLOW_LATENCY_MS,
+    token_delay_ms: float = FAKE_LLM_TOKEN_DELAY_MS,
+    rate_limit_ratio: float = FAKE_LLM_RATE_LIMIT_RATIO,
+    retry_after_seconds: float = FAKE_LLM_RETRY_AFTER_SECONDS,
+    error_ratio: float = FAKE_LLM_ERROR_RATIO,
+) -> FastAPI:
+    fake_app = FastAPI()
+    # Tweak at runtime (e.g. take a backend down mid-benchmark)
+    fake_app.state.error_ratio = error_ratio
+
+    def latency_seconds():
+        if random.random() < slow_ratio:
+            return slow_latency_ms / 1000
+        return (latency_ms + random.uniform(0, jitter_ms)) / 1000
+
+    @fake_app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake-model")
+
+        if random.random() < rate_limit_ratio:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                headers={"Retry-After": str(retry_after_seconds)},
+            )
+
+        if random.random() < fake_app.state.error_ratio:
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected failure", "type": "server_error"}},
+            )
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                stream_chunks(completion_id, model, latency_seconds(), token_delay_ms, include_usage),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(latency_seconds())
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": FAKE_CONTENT},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        }
+
+    return fake_app
+
+
+async def stream_chunks(completion_id: str, model: str, latency: float, token_delay_ms: float, include_usage: bool):
+    # Time to first token is a fraction of the full latency, like a real provider
+    await asyncio.sleep(latency / 5)
+
+    def chunk(choices, **extra):
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+            **extra,
+        }
+
+    for token in FAKE_CONTENT.split(" "):
+        delta = [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}]
+        yield f"data: {json.dumps(chunk(delta))}\n\n"
+        await asyncio.sleep(token_delay_ms / 1000)
+
+    if include_usage:
+        usage = {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+        yield f"data: {json.dumps(chunk([], usage=usage))}\n\n"
+
+    yield "data: [DONE]\n\n"
+
+
+app = create_app()
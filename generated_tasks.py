@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+import cache
+import database
+
+load_dotenv()
+
+# Generated tasks expire after a week by default (completions keep their own copy of the text)
+GENERATED_TASK_TTL_SECONDS = int(os.getenv("GENERATED_TASK_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Tasks never change once stored, so evaluate + complete for the same task read Mongo once
+_task_cache = cache.TTLCache(int(os.getenv("GENERATED_TASK_CACHE_SIZE", "10000")), 3600)
+
+
+def prompt_hash(messages: List[Dict[str, str]]) -> str:
+    """Hash of the generation prompt, so tasks generated from identical prompts can be found and reused"""
+    return hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def save_task(
+    user_id: str, track: str, lesson_index: int, task_no: int, text: str, messages: List[Dict[str, str]]
+) -> str:
+    """Store a task shown to a user and return its id (the taskId clients send back)"""
+    task = {
+        "user_id": user_id,
+        "track": track,
+        "lesson_index": lesson_index,
+        "task_no": task_no,
+        "text": text,
+        "prompt_hash": prompt_hash(messages),
+        "created_at": datetime.utcnow()
+    }
+    result = await database.get_collection("generated_tasks").insert_one(task)
+    task_id = str(result.inserted_id)
+    _task_cache.set(task_id, task)
+    return task_id
+
+
+async def get_task(task_id: Optional[str], user_id: str) -> Optional[Dict[str, Any]]:
+    """A stored task by id, if it exists, belongs to the user and hasn't expired"""
+    if not task_id or not ObjectId.is_valid(task_id):
+        return None
+
+    task = _task_cache.get(task_id)
+    if task is None:
+        task = await database.get_collection("generated_tasks").find_one({"_id": ObjectId(task_id)})
+        if task is None:
+            return None
+        _task_cache.set(task_id, task)
+
+    return task if task["user_id"] == user_id else None
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from pymongo.errors import DuplicateKeyError
+
+import database
+
+# One document per user per year: {user_id, year, tasks: [366 ints], xp: [366 ints]}, indexed by day of year
+DAYS_PER_YEAR_DOC = 366
+
+
+def day_index(day: datetime) -> int:
+    return day.timetuple().tm_yday - 1
+
+
+def empty_year(user_id: str, year: int) -> Dict[str, Any]:
+    return {"user_id": user_id, "year": year, "tasks": [0] * DAYS_PER_YEAR_DOC, "xp": [0] * DAYS_PER_YEAR_DOC}
+
+
+def heatmap_update(xp_earned: int, now: datetime) -> Dict[str, Any]:
+    index = day_index(now)
+    return {"$inc": {f"tasks.{index}": 1, f"xp.{index}": xp_earned}}
+
+
+async def record_activity(user_id: str, xp_earned: int, now: datetime, session=None):
+    """
+    Add one completion to the user's heatmap for the year.
+    An upsert would create {"tasks": {"<day>": 1}} instead of an array, so a missing year
+    document is inserted zero-filled first and the $inc retried.
+    """
+    heatmaps = database.get_collection("activity_heatmaps")
+    year_filter = {"user_id": user_id, "year": now.year}
+    update = heatmap_update(xp_earned, now)
+
+    result = await heatmaps.update_one(year_filter, update, session=session)
+    if result.matched_count:
+        return
+    try:
+        await heatmaps.insert_one(empty_year(user_id, now.year), session=session)
+    except DuplicateKeyError:
+        pass  # a concurrent completion created it
+    await heatmaps.update_one(year_filter, update, session=session)
+
+
+async def fetch_heatmap(user_id: str, days: int, today: datetime) -> List[Dict[str, Any]]:
+    """Active days in the window ending today, oldest first; reads at most one document per year spanned"""
+    start = today - timedelta(days=days - 1)
+    years = list(range(start.year, today.year + 1))
+    cursor = database.get_collection("activity_heatmaps").find(
+        {"user_id": user_id, "year": {"$in": years}},
+        {"_id": 0, "year": 1, "tasks": 1, "xp": 1}
+    )
+    by_year = {doc["year"]: doc async for doc in cursor}
+
+    active_days = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        doc = by_year.get(day.year)
+        if doc is None:
+            continue
+        index = day_index(day)
+        count = doc["tasks"][index]
+        if count:
+            active_days.append({"date": day.strftime("%Y-%m-%d"), "count": count, "xp": doc["xp"][index]})
+    return active_days
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sortedcontainers import SortedList
+
+import database
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard settings
+LEADERBOARD_ENABLED = os.getenv("LEADERBOARD_ENABLED", "true").lower() in ("1", "true", "yes")
+# Each worker keeps its own boards; the periodic rebuild picks up completions recorded by other workers
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+
+GLOBAL = "global"
+ALL_TIME = "all"
+WEEKLY = "week"
+
+
+def week_start(now: datetime) -> datetime:
+    """Monday 00:00 (UTC) of the week containing now"""
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class Leaderboard:
+    """XP scores kept sorted as (-xp, user_id), so top-N and rank lookups are O(log n)"""
+
+    def __init__(self, scores: Optional[Dict[str, int]] = None):
+        self._scores: Dict[str, int] = dict(scores or {})
+        # Sorting once is much faster than inserting a million scores one by one
+        self._sorted = SortedList((-xp, user_id) for user_id, xp in self._scores.items())
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def set(self, user_id: str, xp: int):
+        previous = self._scores.get(user_id)
+        if previous is not None:
+            self._sorted.remove((-previous, user_id))
+        self._scores[user_id] = xp
+        self._sorted.add((-xp, user_id))
+
+    def add(self, user_id: str, xp: int):
+        self.set(user_id, self._scores.get(user_id, 0) + xp)
+
+    def rank_of_score(self, xp: int) -> int:
+        # (-xp,) sorts before every (-xp, user_id), so ties share the best rank (1, 1, 3, ...)
+        return self._sorted.bisect_left((-xp,)) + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        return [
+            {"user_id": user_id, "xp": -negative_xp, "rank": self.rank_of_score(-negative_xp)}
+            for negative_xp, user_id in self._sorted[offset:offset + limit]
+        ]
+
+    def rank(self, user_id: str) -> Optional[Dict[str, Any]]:
+        xp = self._scores.get(user_id)
+        if xp is None:
+            return None
+        return {"user_id": user_id, "xp": xp, "rank": self.rank_of_score(xp), "total": len(self._scores)}
+
+
+class LeaderboardRegistry:
+    """All-time and weekly boards, globally and per track, keyed by (scope, window)"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._boards: Dict[Tuple[str, str], Leaderboard] = {}
+        self._week_start = week_start(datetime.utcnow())
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[datetime] = None
+
+    def board(self, track: Optional[str] = None, window: str = ALL_TIME) -> Leaderboard:
+        if window == WEEKLY:
+            self._roll_week(datetime.utcnow())
+        return self._boards.get((track or GLOBAL, window)) or Leaderboard()
+
+
+    def _roll_week(self, now: datetime):
+        current = week_start(now)
+        if current != self._week_start:
+            self._week_start = current
+            for key in [key for key in self._boards if key[1] == WEEKLY]:
+                del self._boards[key]
+
+    def record(self, user_id: str, track: str, xp: int, now: datetime):
+        """Apply one completion to every board it counts towards"""
+        self._roll_week(now)
+        for scope in (GLOBAL, track):
+            for window in (ALL_TIME, WEEKLY):
+                self._boards.setdefault((scope, window), Leaderboard()).add(user_id, xp)
+
+    async def load(self):
+        """
+        Rebuild every board from MongoDB and swap them in.
+        Completions recorded while the rebuild runs may be missing until the next one.
+        """
+        db = database.get_database()
+        scores: Dict[Tuple[str, str], Dict[str, int]] = {(GLOBAL, ALL_TIME): {}, (GLOBAL, WEEKLY): {}}
+        current_week = week_start(datetime.utcnow())
+
+        # Global all-time from users.stats.total_xp (index: stats.total_xp)
+        global_scores = scores[(GLOBAL, ALL_TIME)]
+        async for user in db.users.find({"stats.total_xp": {"$gt": 0}}, {"stats.total_xp": 1}):
+            global_scores[str(user["_id"])] = user["stats"]["total_xp"]
+
+        # Per track all-time (index: track_slug, user_id, xp_earned)
+        async for row in db.task_completions.aggregate([
+            {"$group": {"_id": {"track": "$track_slug", "user": "$user_id"}, "xp": {"$sum": "$xp_earned"}}}
+        ], allowDiskUse=True):
+            scores.setdefault((row["_id"]["track"], ALL_TIME), {})[row["_id"]["user"]] = row["xp"]
+
+        # This week, globally and per track (index: completed_at, track_slug, user_id, xp_earned)
+        weekly_scores = scores[(GLOBAL, WEEKLY)]
+        async for row in db.task_completions.aggregate([
+            {"$match": {"completed_at": {"$gte": current_week}}},
+            {"$group": {"_id": {"track": "$track_slug", "user": "$user_id"}, "xp": {"$sum": "$xp_earned"}}}
+        ], allowDiskUse=True):
+            user_id = row["_id"]["user"]
+            scores.setdefault((row["_id"]["track"], WEEKLY), {})[user_id] = row["xp"]
+            weekly_scores[user_id] = weekly_scores.get(user_id, 0) + row["xp"]
+
+        self._boards = {key: Leaderboard(board_scores) for key, board_scores in scores.items()}
+        self._week_start = current_week
+        self.loaded_at = datetime.utcnow()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Leaderboard refresh failed: {e}")
+
+    async def start(self):
+        """Load the boards and start the periodic rebuild"""
+        try:
+            await self.load()
+            logger.info(f"Leaderboard loaded ({len(self.board())} users)")
+        except Exception as e:
+            logger.warning(f"Leaderboard load failed: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+boards = LeaderboardRegistry(LEADERBOARD_REFRESH_SECONDS)
@@ -0,0 +1,507 @@
+"""
+LLM gateway: every chat completion in the app goes through here.
+- Several OpenAI-compatible backends (LLM_BACKENDS), tried in order, each with its own timeout
+  and circuit breaker, so a failing provider is skipped instead of slowing every user down
+- Per-endpoint model routes (GENERATE: cheap model for task generation, EVALUATE: stronger one)
+- Retries with full-jitter backoff (or the provider's Retry-After), failing over to the next backend
+- Optional hedging: if a completion takes longer than the model's recent p95, a second request
+  goes to another backend and the first answer wins
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+import metrics
+import singleflight
+
+load_dotenv()
+
+
+def _env_mapping(name: str) -> Dict[str, str]:
+    """Parse "a=b,c=d" into {"a": "b", "c": "d"}"""
+    mapping = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+# Default provider settings (the "primary" backend when LLM_BACKENDS isn't set)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://go.fastrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+# Backends in failover order; each reads LLM_BACKEND_<NAME>_BASE_URL / _API_KEY / _TIMEOUT_SECONDS
+# and _MODELS (e.g. "openai/gpt-4o-mini=gpt-4o-mini" when a provider names models differently)
+LLM_BACKENDS = [name.strip() for name in os.getenv("LLM_BACKENDS", "primary").split(",") if name.strip()]
+
+# Model per route
+GENERATE = "generate"
+EVALUATE = "evaluate"
+LLM_ROUTE_MODELS = {
+    GENERATE: os.getenv("LLM_GENERATE_MODEL", LLM_MODEL),
+    EVALUATE: os.getenv("LLM_EVALUATE_MODEL", LLM_MODEL),
+}
+
+# Connection pool size and the number of completions allowed in flight per worker
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "50"))
+
+# Attempts per completion (across backends) and the jittered backoff between them
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5"))
+LLM_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_MAX_BACKOFF_SECONDS", "8"))
+
+# Consecutive failures that open a backend's circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Hedged requests: fire a second request once the first is slower than the model's recent p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "5"))
+
+# Identical completions requested while one is in flight share its result
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+# Ask for token usage in the final chunk of streamed completions (stream_options.include_usage)
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").lower() in ("1", "true", "yes")
+
+
+class CircuitOpenError(Exception):
+    """Every backend's circuit is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (CircuitOpenError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409, 429)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The provider's Retry-After hint, if the error carries one"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(error: Exception, attempt: int) -> float:
+    """Retry-After if the provider sent one, otherwise full-jitter exponential backoff"""
+    delay = retry_after_seconds(error)
+    if delay is None:
+        delay = random.uniform(0, min(LLM_MAX_BACKOFF_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` consecutive failures, then open for `cooldown_seconds`.
+    After the cooldown one probe request is let through (half-open): success closes the
+    circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def available(self) -> bool:
+        """Would a request be let through now"""
+        if self.opened_at is None:
+            return True
+        return not self._probing and time.monotonic() - self.opened_at >= self.cooldown_seconds
+
+    def acquire(self) -> bool:
+        """Let a request through if available; in the half-open state it becomes the probe"""
+        if not self.available():
+            return False
+        if self.opened_at is not None:
+            self._probing = True
+        return True
+
+    def _stale(self) -> bool:
+        # Requests that started before the circuit opened don't decide it; only the probe does
+        return self.opened_at is not None and not self._probing
+
+    def record_success(self):
+        if self._stale():
+            return
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        if self._stale():
+            return
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """A request ended without a verdict (cancelled): let the next one probe"""
+        self._probing = False
+
+
+class LatencyTracker:
+    """Recent successful latencies of a model, for the hedging threshold"""
+
+    def __init__(self, size: int = 256):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._sorted: List[float] = []
+        self._stale = 0
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._stale += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < 20:
+            return None
+        # Re-sort every 16 samples rather than on every call
+        if self._stale >= 16 or not self._sorted:
+            self._sorted = sorted(self._samples)
+            self._stale = 0
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class Backend:
+    """One OpenAI-compatible provider"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: Optional[str],
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        models: Optional[Dict[str, str]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout_seconds = timeout_seconds
+        self.models = models or {}
+        self.breaker = breaker or CircuitBreaker()
+        self.client: Optional[AsyncOpenAI] = None
+
+    @classmethod
+    def from_env(cls, name: str) -> "Backend":
+        prefix = f"LLM_BACKEND_{name.upper()}_"
+        primary = name == "primary"
+        return cls(
+            name,
+            os.getenv(prefix + "BASE_URL", LLM_BASE_URL if primary else ""),
+            os.getenv(prefix + "API_KEY", os.getenv("FASTROUTER_API_KEY") if primary else None),
+            float(os.getenv(prefix + "TIMEOUT_SECONDS", str(LLM_TIMEOUT_SECONDS))),
+            _env_mapping(prefix + "MODELS"),
+        )
+
+    def model_for(self, model: str) -> str:
+        return self.models.get(model, model)
+
+    def get_client(self) -> AsyncOpenAI:
+        if self.client is None:
+            self.client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                timeout=self.timeout_seconds,
+                # The gateway retries (and fails over) itself
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                ),
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+class Gateway:
+    def __init__(
+        self,
+        backends: List[Backend],
+        route_models: Optional[Dict[str, str]] = None,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+    ):
+        self.backends = backends
+        self.route_models = route_models or {}
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.max_concurrency = max_concurrency
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls) -> "Gateway":
+        return cls([Backend.from_env(name) for name in LLM_BACKENDS], LLM_ROUTE_MODELS)
+
+    def route_model(self, route: Optional[str] = None) -> str:
+        return self.route_models.get(route, LLM_MODEL)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _next_backend(self, tried=()) -> Backend:
+        """First backend (in failover order) not tried yet whose circuit lets a request through"""
+        for backend in self.backends:
+            if backend not in tried and backend.breaker.acquire():
+                return backend
+        for backend in self.backends:
+            if backend.breaker.acquire():
+                return backend
+        raise CircuitOpenError("No LLM backend available: every circuit is open")
+
+    def _has_untried(self, tried) -> bool:
+        return any(backend not in tried and backend.breaker.available() for backend in self.backends)
+
+    def _record(self, backend: Backend, error: Optional[BaseException]):
+        if isinstance(error, (asyncio.CancelledError, openai.RateLimitError)):
+            # No verdict on the backend's health: cancelled, or just asked to slow down
+            backend.breaker.release()
+        elif error is None or not is_retryable(error):
+            # The backend answered (a 4xx is the request's fault, not the provider's)
+            backend.breaker.record_success()
+        else:
+            backend.breaker.record_failure()
+        metrics.set_llm_circuit_open(backend.name, backend.breaker.is_open)
+
+    def hedge_delay(self, route_key: str) -> float:
+        tracker = self._latency.get(route_key)
+        threshold = tracker.quantile(LLM_HEDGE_QUANTILE) if tracker else None
+        if threshold is None:
+            return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, threshold)
+
+    async def _complete_once(self, backend: Backend, model: str, messages, response_format) -> str:
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            try:
+                completion = await backend.get_client().chat.completions.create(
+                    model=backend.model_for(model),
+                    messages=messages,
+                    **({"response_format": response_format} if response_format else {}),
+                )
+            except BaseException as e:
+                self._record(backend, e)
+                outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+                metrics.observe_llm_call(backend.name, model, "complete", outcome, time.perf_counter() - start)
+                raise
+            elapsed = time.perf_counter() - start
+            self._record(backend, None)
+            metrics.observe_llm_call(backend.name, model, "complete", "ok", elapsed, completion.usage)
+            self._latency.setdefault(model, LatencyTracker()).add(elapsed)
+
+        return completion.choices[0].message.content
+
+    async def _complete_hedged(self, backend: Backend, model: str, messages, response_format, tried) -> str:
+        """Run on `backend`; past the hedge delay, race a second request on another backend"""
+        first = asyncio.create_task(self._complete_once(backend, model, messages, response_format))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(model))
+            if done:
+                return first.result()
+
+            try:
+                hedge_backend = self._next_backend(tried=[*tried, backend])
+            except CircuitOpenError:
+                return await first
+            metrics.count_llm_hedge(hedge_backend.name)
+            tasks.add(asyncio.create_task(self._complete_once(hedge_backend, model, messages, response_format)))
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        route: Optional[str] = None,
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        model = model or self.route_model(route)
+        attempts = self.max_attempts if max_retries is None else max_retries + 1
+        tried: List[Backend] = []
+
+        for attempt in range(1, attempts + 1):
+            backend = self._next_backend(tried)
+            try:
+                if self.hedge:
+                    return await self._complete_hedged(backend, model, messages, response_format, tried)
+                return await self._complete_once(backend, model, messages, response_format)
+            except Exception as e:
+                if attempt == attempts or not is_retryable(e):
+                    raise
+                tried.append(backend)
+                # Fail over straight away while there's a healthy backend left to try
+                if not self._has_untried(tried):
+                    tried.clear()
+                    await asyncio.sleep(backoff_seconds(e, attempt))
+
+    async def _stream_once(self, backend: Backend, model: str, messages) -> AsyncIterator[str]:
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            first_token = True
+            usage = None
+            outcome = "error"
+            error: Optional[BaseException] = None
+            try:
+                stream = await backend.get_client().chat.completions.create(
+                    model=backend.model_for(model),
+                    messages=messages,
+                    stream=True,
+                    **({"stream_options": {"include_usage": True}} if LLM_STREAM_USAGE else {}),
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first_token:
+                                metrics.observe_first_token(backend.name, model, time.perf_counter() - start)
+                                first_token = False
+                            yield chunk.choices[0].delta.content
+                outcome = "ok"
+            except (GeneratorExit, asyncio.CancelledError) as e:
+                # The client disconnected or the consumer stopped reading
+                outcome = "cancelled"
+                error = asyncio.CancelledError() if isinstance(e, GeneratorExit) else e
+                raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._record(backend, error)
+                metrics.observe_llm_call(backend.name, model, "stream", outcome, time.perf_counter() - start, usage)
+
+    async def stream_chat_completion(
+        self, messages: List[Dict[str, str]], route: Optional[str] = None, model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream text deltas; fails over only until the first delta (after that a retry would repeat text)"""
+        model = model or self.route_model(route)
+        tried: List[Backend] = []
+
+        for attempt in range(1, self.max_attempts + 1):
+            backend = self._next_backend(tried)
+            started = False
+            try:
+                # aclosing: a consumer that stops early closes the provider stream right away
+                async with aclosing(self._stream_once(backend, model, messages)) as deltas:
+                    async for delta in deltas:
+                        started = True
+                        yield delta
+                return
+            except Exception as e:
+                if started or attempt == self.max_attempts or not is_retryable(e):
+                    raise
+                tried.append(backend)
+                if not self._has_untried(tried):
+                    tried.clear()
+                    await asyncio.sleep(backoff_seconds(e, attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backends": [
+                {
+                    "name": backend.name,
+                    "base_url": backend.base_url,
+                    "circuit_open": backend.breaker.is_open,
+                    "consecutive_failures": backend.breaker.failures,
+                }
+                for backend in self.backends
+            ],
+            "routes": {route: self.route_model(route) for route in self.route_models},
+            "hedging": self.hedge,
+            "hedge_delay_seconds": {model: self.hedge_delay(model) for model in self._latency},
+        }
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.close()
+
+
+# Global gateway, configured from the environment
+gateway = Gateway.from_env()
+inflight = singleflight.SingleFlight()
+
+
+def route_model(route: Optional[str] = None) -> str:
+    """The model a route's completions use (part of evaluation cache keys)"""
+    return gateway.route_model(route)
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    max_retries: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    route: Optional[str] = None,
+) -> str:
+    """Run a chat completion without blocking the event loop and return the message text"""
+    if not LLM_SINGLE_FLIGHT:
+        return await gateway.chat_completion(messages, route, model, max_retries, response_format)
+
+    model = model or gateway.route_model(route)
+    return await inflight.do(
+        singleflight.prompt_key(messages, model, response_format),
+        lambda: gateway.chat_completion(messages, route, model, max_retries, response_format),
+    )
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]], model: Optional[str] = None, route: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Run a streaming chat completion and yield text deltas as the model produces them"""
+    async with aclosing(gateway.stream_chat_completion(messages, route, model)) as deltas:
+        async for delta in deltas:
+            yield delta
+
+
+async def close_llm_client():
+    """Close every backend's client and connection pool"""
+    await gateway.close()
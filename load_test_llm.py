@@ -0,0 +1,56 @@
+"""
+Load test for the async LLM client against the local fake LLM server
+Shows completions/sec scaling with the number of in-flight requests
+Run: python load_test_llm.py
+"""
+import asyncio
+import os
+import time
+
+import uvicorn
+
+FAKE_LLM_PORT = int(os.getenv("FAKE_LLM_PORT", "9100"))
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{FAKE_LLM_PORT}/v1"
+os.environ.setdefault("FASTROUTER_API_KEY", "fake-key")
+
+import llm
+from fake_llm_server import app as fake_app, FAKE_LLM_LATENCY_MS
+
+CONCURRENCY_LEVELS = [1, 5, 10, 25, 50]
+REQUESTS_PER_WORKER = 4
+
+
+async def run_level(concurrency: int):
+    async def worker(worker_id: int):
+        for i in range(REQUESTS_PER_WORKER):
+            # A distinct prompt per request, so single-flight doesn't coalesce them into one call
+            content = f"Generate ONE practical task (worker {worker_id}, request {i})"
+            await llm.chat_completion([{"role": "user", "content": content}])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    total = concurrency * REQUESTS_PER_WORKER
+    print(f"   in-flight={concurrency:>3}  requests={total:>4}  time={elapsed:6.2f}s  throughput={total / elapsed:7.2f} req/s")
+
+
+async def main():
+    server = uvicorn.Server(uvicorn.Config(fake_app, port=FAKE_LLM_PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"🔄 Fake LLM latency: {FAKE_LLM_LATENCY_MS:.0f} ms, client concurrency cap: {llm.LLM_MAX_CONCURRENCY}")
+    try:
+        for level in CONCURRENCY_LEVELS:
+            await run_level(level)
+        print(f"   single-flight: {llm.inflight.stats()}")
+    finally:
+        await llm.close_llm_client()
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,207 @@
+"""
+Non-blocking logging: loggers only put records on an in-memory queue, and a QueueListener
+thread formats them (JSON by default) and writes them to stderr or LOG_FILE.
+Records carry the request id of the request that logged them, and noisy loggers can be
+sampled (LOG_SAMPLE_RATES) before anything is queued.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_FILE = os.getenv("LOG_FILE", "")  # empty: stderr
+
+
+def _sample_rates(value: str) -> Dict[str, float]:
+    """Parse "uvicorn.access=0.1,routers.tracks_router=0.5" into {logger name: keep ratio}"""
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+LOG_SAMPLE_RATES = _sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id (runs in the calling thread, before queueing)"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records of chosen loggers (and their children); warnings always pass"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id, extras and traceback"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records with their message rendered but not formatted: the listener thread does
+    the JSON/text formatting. Tracebacks are rendered here because exc_info can't be kept.
+    """
+
+    def prepare(self, record):
+        message = record.getMessage()
+        exc_text = None
+        if record.exc_info:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg, record.args = message, None
+        record.exc_info, record.exc_text = None, exc_text or record.exc_text
+        return record
+
+
+class LoggingSetup:
+    """The queue handler installed on the root logger and the listener draining it"""
+
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self, level=LOG_LEVEL, log_format=LOG_FORMAT, log_file=LOG_FILE, sample_rates=None, handler=None):
+        """Route all logging (uvicorn's too) through the queue. Safe to call again to reconfigure."""
+        self.stop()
+
+        if handler is None:
+            handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler()
+        handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+        record_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(record_queue)
+        queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates))
+        queue_handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        # uvicorn installs its own synchronous handlers; send its records through the queue too
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        self.listener = logging.handlers.QueueListener(record_queue, handler, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+
+logging_setup = LoggingSetup()
+atexit.register(logging_setup.stop)
+
+
+class RequestIdMiddleware:
+    """Give every HTTP request an id (the caller's X-Request-ID, or a new one) for its log records"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        # Not reset on error, so the app's exception handler (which runs outside this middleware) logs the id too
+        await self.app(scope, receive, send_with_request_id)
+        request_id_var.reset(token)
@@ -1,15 +1,16 @@
-from fastapi import FastAPI, Depends, Request
-from pydantic import BaseModel
-from typing import Optional
-from openai import OpenAI
-import json, os, traceback, logging
+from fastapi import FastAPI, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import json, os, logging
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+import logging_config
+
+# Setup logging (queued, written by a background thread)
+logging_config.logging_setup.configure()
 logger = logging.getLogger(__name__)
 
 # Import database and routers
@@ -17,9 +18,22 @@ import database
 import auth
 import models
 import dependencies
+import llm
+import metrics
+import ratelimit
+import cache
+import curriculum_registry
+import task_pool
+import write_behind
+import leaderboard
+import batch_evaluation
+import evaluation
+import generated_tasks
+from task_prompt import build_task_messages
 from routers.auth_router import router as auth_router
 from routers.users_router import router as users_router
 from routers.tracks_router import router as tracks_router
+from routers.leaderboard_router import router as leaderboard_router
 
 
 load_dotenv()
@@ -29,10 +43,17 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup: Connect to MongoDB
     await database.connect_to_mongo()
+    if task_pool.TASK_POOL_ENABLED:
+        await task_pool.pool.start(build_task_messages)
+    if leaderboard.LEADERBOARD_ENABLED:
+        await leaderboard.boards.start()
     print("\n\n✅✅✅ BACKEND RESTARTED SUCCESSFULLY! READY FOR REQUESTS ✅✅✅\n\n")
     yield
-    # Shutdown: Close MongoDB connection
+    # Shutdown: Stop the task pool and leaderboard refresh, close MongoDB connection and the LLM connection pool
+    await task_pool.pool.stop()
+    await leaderboard.boards.stop()
     await database.close_mongo_connection()
+    await llm.close_llm_client()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -43,14 +64,20 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", logging_config.REQUEST_ID_HEADER],
 )
 
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Outermost, so every log record of a request carries its id
+app.add_middleware(logging_config.RequestIdMiddleware)
+
 
 # Global exception handler to ensure CORS headers are always present
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled error on {request.method} {request.url}: {exc}")
-    logger.error(traceback.format_exc())
+    logger.error(f"Unhandled error on {request.method} {request.url}: {exc}", exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": f"Internal server error: {str(exc)}"},
@@ -66,45 +93,30 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(tracks_router)
+app.include_router(leaderboard_router)
 
 
 
 
-client = OpenAI(
-    base_url="https://go.fastrouter.ai/api/v1",
-    api_key=os.getenv("FASTROUTER_API_KEY"),
-)
-
-
-# -------- LOAD CURRICULUM --------
-curricula = {}
-possible_tracks = ["chatgpt", "ai-coding"]
-
-for track in possible_tracks:
-    try:
-        with open(f"curriculum/{track}.json") as f:
-            curricula[track] = json.load(f)
-    except FileNotFoundError:
-        print(f"Warning: Curriculum for {track} not found.")
-
-# ... (Previous imports remain)
-
+# -------- CURRICULUM --------
 @app.get("/lessons/{track}")
 async def get_lessons(track: str):
-    if track not in curricula:
+    curriculum = curriculum_registry.registry.get(track)
+    if curriculum is None:
         return {"lessons": []}
 
     return {
-        "lessons": curricula[track]["lessons"]
+        "lessons": curriculum.lessons
     }
 
 @app.get("/tasks/{track}")
 async def get_tasks(track: str):
-    if track not in curricula:
+    curriculum = curriculum_registry.registry.get(track)
+    if curriculum is None:
         return {"tasks": []}
     
     return {
-        "tasks": curricula[track].get("tasks", [])
+        "tasks": curriculum.tasks
     }
 
 # -------- REQUEST MODELS --------
@@ -119,78 +131,46 @@ class EvalRequest(BaseModel):
     taskId: Optional[str] = None
 
 
-# -------- PROMPT BUILDER --------
-def build_system_prompt(track, lesson_index, task_no, previous_feedback=None, preferences=None):
-    # Select correct curriculum
-    target_curriculum = curricula.get(track, curricula.get("chatgpt")) 
-    
-    try:
-        lesson = target_curriculum["lessons"][lesson_index]
-    except IndexError:
-        lesson = target_curriculum["lessons"][0]
+class BatchEvalRequest(BaseModel):
+    items: Optional[List[batch_evaluation.BatchItem]] = None
+    selection: Optional[batch_evaluation.BatchSelection] = None
+    write_back: bool = True
+    concurrency: Optional[int] = Field(None, ge=1)
 
-    feedback_instruction = ""
-    if previous_feedback:
-        feedback_instruction = f"""
-ADAPTIVE INSTRUCTION:
-The user previously struggled with: "{previous_feedback}".
-You MUST include a requirement in this new task that specifically forces the user to practice this weak area.
-"""
-
-    preference_instruction = ""
-    if preferences:
-        goal = preferences.get("goal", "general learning")
-        level = preferences.get("level", "intermediate")
-        role = preferences.get("role", "student")
-        
-        preference_instruction = f"""
-PERSONALIZATION (CRITICAL):
-- The User's Role is: {role}
-- The User's Goal is: {goal}
-- Skill Level: {level}
-
-You MUST tailor everything about this task specifically to resonate with someone who is a "{role}".
-The scenario you create, the examples you use, and the terminology MUST be uniquely relevant to a {role} trying to achieve their goal of {goal}.
-If they are a Marketer, the scenario is a marketing campaign. If a Developer, it's code generation. 
-If a Founder, it's a pitch deck. Speak to them and craft tasks purely in the context of their daily responsibilities!
-"""
-
-    return f"""
-You are an AI Learning Mentor.
-
-Track: {target_curriculum.get('track', track)}
-Lesson: {lesson['title']}
-Lesson Description: {lesson['description']}
-Topics: {', '.join(lesson['topics'])}
-
-User State:
-- Task Number: {task_no}
-{preference_instruction}
-{feedback_instruction}
-
-Teaching Flow & Activity Rules based on Lesson (Choose appropriately based on the 'Lesson'):
-- If Lesson 1 (Understanding LLM Behavior): Briefly explain how LLMs predict the next word. Then, give the user a task to write ONE prompt exploring a complex topic using a specific constraint (e.g., "Explain Quantum mechanics like I'm 10"). The user must submit perfectly ONE prompt and ONE output for evaluation.
-- If Lesson 2 (Core Prompting Techniques): Briefly explain one specific technique (Role, Few-Shot, or Zero-Shot). Then, ask them to write ONE prompt applying that exact technique.
-- If Lesson 3 (Prompt Structure Framework): Briefly introduce the structure "[ROLE] + [CONTEXT] + [TASK] + [CONSTRAINTS] + [OUTPUT FORMAT]". Give them a vague scenario and ask them to write ONE complete prompt following this framework.
-- If Lesson 4 (Iteration & Refinement): Provide a badly formulated prompt. Ask them to write ONE improved prompt that fixes it, and submit the new output. 
-- If Lesson 5 (Real-World Applications): Ask the user to pick a real-world task relevant to their role and write ONE highly structured prompt to accomplish it.
-- If Lesson 6 (Advanced Prompting): Ask the user to write ONE advanced prompt that forces the AI to outline steps logically before giving an answer.
-
-General Rules (CRITICAL FOR UI COMPATIBILITY):
-- The testing platform ONLY supports submitting ONE singular User Prompt and ONE AI Output at a time for evaluation. 
-- NEVER ask the user to compare multiple prompts in the same task. 
-- NEVER ask the user to just answer a question; the task MUST ALWAYS be to create a specific prompt to feed to ChatGPT.
-- ALWAYS end your response by explicitly instructing the user to craft ONE prompt and paste the resulting AI output into the platform for evaluation.
-- Maintain a highly focused, encouraging mentor tone.
-"""
+
+# -------- STREAMING --------
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one server-sent event"""
+    payload = f"data: {json.dumps(data)}\n\n"
+    if event:
+        payload = f"event: {event}\n" + payload
+    return payload
+
+
+async def sse_with_errors(events, request: Request):
+    """
+    Pass events through; an error after the response has started can't become a 500 any more,
+    so it is logged and sent as a final `error` event instead of cutting the stream short
+    """
+    try:
+        async for event in events:
+            yield event
+    except Exception as e:
+        logger.error(f"Stream failed on {request.method} {request.url}: {e}", exc_info=e)
+        yield sse_event({"detail": f"Internal server error: {str(e)}"}, event="error")
+
+
+def sse_response(events, request: Request) -> StreamingResponse:
+    return StreamingResponse(
+        sse_with_errors(events, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # -------- GENERATE TASK --------
-@app.post("/generate-task")
-async def generate_task(
-    data: TaskRequest,
-    current_user: models.UserInDB = Depends(dependencies.get_current_user)
-):
+async def load_task_context(data: TaskRequest, current_user: models.UserInDB):
+    """Load the user's lesson, task number, preferences and last feedback for a track"""
     db = database.get_database()
     
     # 1. Get User Progress
@@ -218,77 +198,79 @@ async def generate_task(
     if last_completion and last_completion.get("feedback_summary"):
         previous_feedback = last_completion["feedback_summary"]
 
-    # 3. Build Prompt
-    system_prompt = build_system_prompt(data.track, lesson_index, task_index, previous_feedback, preferences)
+    return lesson_index, task_index, preferences, previous_feedback
 
-    completion = client.chat.completions.create(
-        model="openai/gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "Generate ONE practical task"}
-        ]
-    )
 
-    task_text = completion.choices[0].message.content
+async def take_pooled_task(track, lesson_index, task_no, previous_feedback, preferences):
+    """Serve a pre-generated task unless the user needs an adaptive, feedback-driven one"""
+    if previous_feedback:
+        task_pool.pool.skip()
+        return None
+    return await task_pool.pool.take(track, lesson_index, task_no, preferences)
+
+
+@app.post("/generate-task")
+async def generate_task(
+    data: TaskRequest,
+    current_user: models.UserInDB = Depends(dependencies.get_rate_limited_user)
+):
+    lesson_index, task_index, preferences, previous_feedback = await load_task_context(data, current_user)
+
+    messages = build_task_messages(data.track, lesson_index, task_index, previous_feedback, preferences)
+    task_text = await take_pooled_task(data.track, lesson_index, task_index, previous_feedback, preferences)
+    if task_text is None:
+        task_text = await llm.chat_completion(messages, route=llm.GENERATE)
+
+    # Clients send task_id back as taskId, so grading sees the real task text
+    task_id = await generated_tasks.save_task(current_user.id, data.track, lesson_index, task_index, task_text, messages)
 
     return {
         "task": task_text,
+        "task_id": task_id,
         "lesson_index": lesson_index,
         "previous_feedback": previous_feedback
     }
 
-def get_evaluation_criteria(lesson_title):
-    if "Understanding LLM Behavior" in lesson_title:
-        return "Identify differences in tone, detail, and structure. Explain why prompt wording changes output."
-    elif "Core Prompting Techniques" in lesson_title:
-        return "Effectively use Role Prompting, Zero-shot, or Few-shot techniques. Output quality improves vs basic prompt."
-    elif "Prompt Structure Framework" in lesson_title:
-        return "Includes Role, clear Task, Constraints, and Output Format."
-    elif "Iteration & Refinement" in lesson_title:
-        return "Uses follow-up prompts. Output improves progressively."
-    elif "Real-World Applications" in lesson_title:
-        return "Prompt is well-structured and output is usable in real life."
-    elif "Advanced Prompting" in lesson_title:
-        return "Leverages AI as collaborator. Uses multi-step prompting. Breaks problems into steps."
-    return "Persona, Context, Clear Task, Examples, Iteration"
-
-
-def build_evaluation_prompt(user_prompt, user_output, lesson_title, task_text):
-    criteria = get_evaluation_criteria(lesson_title)
-
-    return f"""
-You are a friendly AI Mentor evaluating a student.
-TASK: {task_text}
-LESSON: {lesson_title}
-CRITERIA: {criteria}
-
-USER PROMPT: {user_prompt}
-LLM OUTPUT: {user_output}
 
-Evaluate. Format exactly like this:
-
-Score: X/10
+@app.post("/generate-task/stream")
+async def generate_task_stream(
+    data: TaskRequest,
+    request: Request,
+    current_user: models.UserInDB = Depends(dependencies.get_rate_limited_user)
+):
+    """Stream the generated task as server-sent events"""
+    lesson_index, task_index, preferences, previous_feedback = await load_task_context(data, current_user)
+    pooled_task = await take_pooled_task(data.track, lesson_index, task_index, previous_feedback, preferences)
 
-What You Did Well:
-- ...
+    messages = build_task_messages(data.track, lesson_index, task_index, previous_feedback, preferences)
 
-What You Missed:
-- (Crucial: List 1-2 specific missing concepts)
+    async def events():
+        yield sse_event({"lesson_index": lesson_index, "previous_feedback": previous_feedback}, event="meta")
+        if pooled_task is not None:
+            task_text = pooled_task
+            yield sse_event({"delta": pooled_task})
+        else:
+            chunks = []
+            async for delta in llm.stream_chat_completion(messages, route=llm.GENERATE):
+                chunks.append(delta)
+                yield sse_event({"delta": delta})
+            task_text = "".join(chunks)
 
-How To Improve:
-- ...
+        task_id = await generated_tasks.save_task(current_user.id, data.track, lesson_index, task_index, task_text, messages)
+        yield sse_event({"task_id": task_id}, event="done")
 
-Feedback Summary:
-(One short sentence summarizing the main mistake for the database)
-"""
+    return sse_response(events(), request)
 
 
 # -------- EVALUATE --------
-@app.post("/evaluate")
-async def evaluate(
-    data: EvalRequest,
-    current_user: models.UserInDB = Depends(dependencies.get_current_user)
-):
+async def prepare_evaluation_messages(data: EvalRequest, current_user: models.UserInDB, structured=None):
+    """Resolve the task (by taskId) or the user's current lesson and build the evaluation messages"""
+    task = await generated_tasks.get_task(data.taskId, current_user.id)
+    if task is not None:
+        return evaluation.evaluation_messages(
+            data.prompt, data.output, task["track"], task["lesson_index"], task["text"], structured=structured
+        )
+
     db = database.get_database()
     progress = await db["track_progress"].find_one({
         "user_id": current_user.id,
@@ -298,21 +280,116 @@ async def evaluate(
     lesson_index = 0
     if progress:
         lesson_index = progress.get("current_lesson_index", 0)
-        
-    try:
-        # Use curricula dictionary
-        target_curriculum = curricula.get(data.track, curricula["chatgpt"])
-        lesson_title = target_curriculum["lessons"][lesson_index]["title"]
-    except:
-        lesson_title = "General Practice"
 
-    eval_prompt = build_evaluation_prompt(data.prompt, data.output, lesson_title, "User's current task")
+    return evaluation.evaluation_messages(data.prompt, data.output, data.track, lesson_index, structured=structured)
 
-    completion = client.chat.completions.create(
-        model="openai/gpt-4o-mini",
-        messages=[{"role": "user", "content": eval_prompt}]
-    )
 
-    evaluation = completion.choices[0].message.content
+@app.post("/evaluate")
+async def evaluate(
+    data: EvalRequest,
+    current_user: models.UserInDB = Depends(dependencies.get_rate_limited_user)
+):
+    """Evaluate a submission; returns the display text plus score, strengths, misses, improvements and summary"""
+    messages = await prepare_evaluation_messages(data, current_user)
+    cache_key = cache.evaluation_cache.make_key(messages, llm.route_model(llm.EVALUATE))
+
+    cached = await cache.evaluation_cache.get(cache_key)
+    if cached is not None:
+        result = evaluation.parse_evaluation_result(cached)
+    else:
+        try:
+            result = await evaluation.request_evaluation(messages)
+        except evaluation.EvaluationRefused as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        await cache.evaluation_cache.set(cache_key, result.model_dump_json(), llm.route_model(llm.EVALUATE))
     
-    return {"evaluation": evaluation}
+    return evaluation.evaluation_response(result)
+
+
+@app.post("/evaluate/stream")
+async def evaluate_stream(
+    data: EvalRequest,
+    request: Request,
+    current_user: models.UserInDB = Depends(dependencies.get_rate_limited_user)
+):
+    """Stream the evaluation as server-sent events, ending with the parsed score and typed fields"""
+    # Free text streams readably; the finished text goes through the tolerant parser
+    messages = await prepare_evaluation_messages(data, current_user, structured=False)
+    cache_key = cache.evaluation_cache.make_key(messages, llm.route_model(llm.EVALUATE))
+    cached = await cache.evaluation_cache.get(cache_key)
+
+    async def events():
+        if cached is not None:
+            result = evaluation.parse_evaluation_result(cached)
+            yield sse_event({"delta": evaluation.render_evaluation(result)})
+        else:
+            chunks = []
+            async for delta in llm.stream_chat_completion(messages, route=llm.EVALUATE):
+                chunks.append(delta)
+                yield sse_event({"delta": delta})
+
+            result = evaluation.parse_evaluation_result("".join(chunks))
+            await cache.evaluation_cache.set(cache_key, result.model_dump_json(), llm.route_model(llm.EVALUATE))
+
+        yield sse_event(evaluation.evaluation_response(result), event="done")
+
+    return sse_response(events(), request)
+
+
+@app.post("/evaluate/batch")
+async def evaluate_batch(
+    data: BatchEvalRequest,
+    current_user: models.UserInDB = Depends(dependencies.get_admin_user)
+):
+    """Grade many submissions concurrently, streaming one NDJSON progress line per item and a summary"""
+    if (data.items is None) == (data.selection is None):
+        raise HTTPException(status_code=400, detail="Provide either items or selection")
+
+    items = data.items if data.items is not None else await batch_evaluation.select_items(data.selection)
+    if len(items) > batch_evaluation.BATCH_EVAL_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {batch_evaluation.BATCH_EVAL_MAX_ITEMS} items per batch")
+
+    concurrency = min(data.concurrency or batch_evaluation.BATCH_EVAL_CONCURRENCY, llm.LLM_MAX_CONCURRENCY)
+    evaluator = batch_evaluation.BatchEvaluator(concurrency)
+
+    async def lines():
+        async for event in evaluator.run(items, write_back=data.write_back):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# -------- CACHE STATS --------
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "evaluation_cache": cache.evaluation_cache.stats(),
+        "user_cache": dependencies.user_cache.stats(),
+        "write_behind": write_behind.queue.stats(),
+        "task_pool": task_pool.pool.stats()
+    }
+
+
+@app.get("/db/pool-stats")
+async def pool_stats():
+    """Mongo connection pool usage, for sizing MONGO_MAX_POOL_SIZE per worker"""
+    return {
+        "max_pool_size": database.settings.max_pool_size,
+        **database.pool_monitor.stats()
+    }
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """LLM backends (circuit state), model per route, hedge thresholds, coalesced calls and rate limiting"""
+    return {**llm.gateway.stats(), "single_flight": llm.inflight.stats(), "rate_limit": ratelimit.limiter.stats()}
+
+
+# -------- METRICS --------
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request, MongoDB and LLM metrics in the Prometheus text format"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,159 @@
+"""
+Prometheus metrics: per-route request latency (ASGI middleware), per-collection MongoDB
+command timings (pymongo CommandListener) and LLM call durations and token counts.
+Everything is exported on GET /metrics.
+"""
+import os
+import time
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Request latencies span cached reads (~1 ms) to streamed LLM responses (tens of seconds)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection",
+    ["collection", "command", "outcome"],
+    buckets=MONGO_BUCKETS,
+)
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "LLM chat completion latency per attempt (streams: until the last chunk)",
+    ["backend", "model", "mode", "outcome"],
+    buckets=LLM_BUCKETS,
+)
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until a streamed LLM completion produces its first text",
+    ["backend", "model"],
+    buckets=LLM_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "LLM tokens reported by the provider",
+    ["backend", "model", "kind"],
+)
+
+LLM_HEDGES = Counter(
+    "llm_hedged_requests",
+    "Second requests sent because the first was slower than the hedge threshold",
+    ["backend"],
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while a backend's circuit breaker is open",
+    ["backend"],
+)
+
+# Requests that match no route share one label so unknown paths can't blow up cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/stream wrapping) timing each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; its path is the template (/api/tracks/{track_slug})
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def _collection_name(command_name: str, command) -> str:
+    if command_name == "getMore":
+        target = command.get("collection")
+    else:
+        target = command.get(command_name)
+    # Database-level commands (ping, endSessions, ...) carry a number instead of a collection name
+    return target if isinstance(target, str) else "<database>"
+
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """
+    Times every MongoDB command by collection. Only the started event carries the command
+    document, so the collection is remembered by (connection, request id) until the command ends.
+    """
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = _collection_name(event.command_name, event.command)
+
+    def _observe(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), "<unknown>")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+mongo_command_monitor = MongoCommandMonitor()
+
+
+def observe_llm_call(backend: str, model: str, mode: str, outcome: str, seconds: float, usage=None):
+    """Record one LLM call and, when the provider reported it, its token usage"""
+    LLM_LATENCY.labels(backend, model, mode, outcome).observe(seconds)
+    if usage is not None:
+        LLM_TOKENS.labels(backend, model, "prompt").inc(usage.prompt_tokens or 0)
+        LLM_TOKENS.labels(backend, model, "completion").inc(usage.completion_tokens or 0)
+
+
+def observe_first_token(backend: str, model: str, seconds: float):
+    LLM_TIME_TO_FIRST_TOKEN.labels(backend, model).observe(seconds)
+
+
+def count_llm_hedge(backend: str):
+    LLM_HEDGES.labels(backend).inc()
+
+
+def set_llm_circuit_open(backend: str, is_open: bool):
+    LLM_CIRCUIT_OPEN.labels(backend).set(1 if is_open else 0)
+
+
+def render():
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
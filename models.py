@@ -9,7 +9,15 @@ class UserStats(BaseModel):
     streak_days: int = 0
     total_xp: int = 0
     total_hours: float = 0.0
+    courses_started: int = 0
     last_activity_date: Optional[datetime] = None
+    last_active_day: Optional[datetime] = None
+
+class ActivityWindowDay(BaseModel):
+    """One day of the rolling activity window kept on the user document"""
+    date: datetime
+    xp: int = 0
+    minutes: float = 0.0
 
 class UserInDB(BaseModel):
     """User document in MongoDB"""
@@ -24,6 +32,7 @@ class UserInDB(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: Optional[datetime] = None
     stats: UserStats = Field(default_factory=UserStats)
+    activity_window: List[ActivityWindowDay] = Field(default_factory=list)
 
 class UserCreate(BaseModel):
     """Schema for user registration"""
@@ -131,6 +140,24 @@ class TaskCompletionCreate(BaseModel):
 class TaskCompletionResponse(TaskCompletion):
     pass
 
+class TaskCompletionListItem(BaseModel):
+    """Completed task in a (possibly projected) history list"""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    id: str = Field(alias="_id")
+    task_id: Optional[str] = None
+    user_id: Optional[str] = None
+    track_slug: Optional[str] = None
+    lesson_index: Optional[int] = None
+    task_index: Optional[int] = None
+    prompt: Optional[str] = None
+    user_output: Optional[str] = None
+    ai_evaluation: Optional[str] = None
+    score: Optional[int] = None
+    xp_earned: Optional[int] = None
+    feedback_summary: Optional[str] = None
+    completed_at: Optional[datetime] = None
+
 
 # ==================== ACTIVITY MODELS ====================
 
@@ -138,6 +165,7 @@ class DailyActivity(BaseModel):
     """Record of daily activity for heatmap"""
     date: str  # YYYY-MM-DD
     count: int = 1
+    xp: int = 0
 
 class DailyActivityResponse(BaseModel):
     activity_date: datetime
@@ -145,3 +173,36 @@ class DailyActivityResponse(BaseModel):
     xp_earned: int
     time_spent_minutes: float
     percentage: float
+
+
+# ==================== DASHBOARD MODELS ====================
+
+class DashboardResponse(BaseModel):
+    """Everything the home page needs in one payload"""
+    user: UserResponse
+    stats: Dict[str, Any]
+    daily_progress: DailyActivityResponse
+    enrolled_tracks: List[TrackProgressResponse]
+
+# ==================== LEADERBOARD MODELS ====================
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    xp: int
+    username: Optional[str] = None
+    display_name: Optional[str] = None
+    avatar_icon: Optional[str] = None
+
+class LeaderboardResponse(BaseModel):
+    track: Optional[str] = None
+    window: str
+    total: int
+    entries: List[LeaderboardEntry]
+
+class LeaderboardRankResponse(BaseModel):
+    track: Optional[str] = None
+    window: str
+    rank: Optional[int] = None  # None until the user earns XP on this board
+    xp: int = 0
+    total: int
@@ -0,0 +1,271 @@
+"""
+Token-bucket rate limiting for the LLM-backed endpoints.
+Every request takes a token from its user's bucket and one from a global bucket. Requests over
+the limit wait (up to RATE_LIMIT_QUEUE_SECONDS) instead of failing straight away: each user's
+own excess waits behind their own bucket, and the global budget is handed out round-robin
+across users, so one scripted client can't crowd out everyone else.
+Buckets live in process memory, or in Mongo (RATE_LIMIT_STORE=mongo) so several workers
+share one limit.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+import cache
+import database
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()  # memory | mongo
+
+# Requests per minute and burst size, per user and for the whole deployment
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "10"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+RATE_LIMIT_GLOBAL_PER_MINUTE = float(os.getenv("RATE_LIMIT_GLOBAL_PER_MINUTE", "600"))
+RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "50"))
+
+# How long an over-limit request may wait for its turn before getting a 429
+RATE_LIMIT_QUEUE_SECONDS = float(os.getenv("RATE_LIMIT_QUEUE_SECONDS", "10"))
+
+# Idle per-user buckets kept in memory (an evicted bucket just starts full again)
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "100000"))
+
+GLOBAL_KEY = "global"
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Reservation-style bucket: a take always succeeds but may leave the bucket negative, and
+    the caller waits until the debt is refilled. Later takes queue behind earlier ones.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token; returns how long to wait until it is actually available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class MemoryStore:
+    """Buckets in this process"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_USERS):
+        self._buckets = cache.TTLCache(max_keys, 3600)
+
+    async def reserve(self, key: str, rate: float, capacity: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+        # Re-set on every use: only idle buckets expire
+        self._buckets.set(key, bucket, ttl_seconds=capacity / rate + RATE_LIMIT_QUEUE_SECONDS)
+        return bucket.reserve(time.monotonic())
+
+    async def refund(self, key: str, rate: float, capacity: float):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+class MongoStore:
+    """
+    Buckets in the rate_limits collection, updated atomically with one findAndModify
+    (refill, then take) so every worker draws from the same bucket.
+    """
+
+    def __init__(self, collection: str = "rate_limits"):
+        self.collection = collection
+
+    async def reserve(self, key: str, rate: float, capacity: float) -> float:
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed_seconds, rate]}]}]}
+        doc = await database.get_collection(self.collection).find_one_and_update(
+            {"_id": key},
+            [{"$set": {"tokens": {"$subtract": [refilled, 1]}, "updated_at": now}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if doc["tokens"] >= 0 else -doc["tokens"] / rate
+
+    async def refund(self, key: str, rate: float, capacity: float):
+        # Capped at capacity like TokenBucket.refund, so repeated refunds can't bank extra tokens
+        await database.get_collection(self.collection).update_one(
+            {"_id": key},
+            [{"$set": {"tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, 1]}]}}}],
+        )
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        store,
+        user_per_minute: float = RATE_LIMIT_USER_PER_MINUTE,
+        user_burst: float = RATE_LIMIT_USER_BURST,
+        global_per_minute: float = RATE_LIMIT_GLOBAL_PER_MINUTE,
+        global_burst: float = RATE_LIMIT_GLOBAL_BURST,
+        queue_seconds: float = RATE_LIMIT_QUEUE_SECONDS,
+        enabled: bool = RATE_LIMIT_ENABLED,
+    ):
+        self.store = store
+        self.user_rate = user_per_minute / 60
+        self.user_burst = user_burst
+        self.global_rate = global_per_minute / 60
+        self.global_burst = global_burst
+        self.queue_seconds = queue_seconds
+        self.enabled = enabled
+        # Requests waiting for the global budget, per user, served round-robin by the dispatcher
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(MongoStore() if RATE_LIMIT_STORE == "mongo" else MemoryStore())
+
+    async def _reserve(self, key: str, rate: float, capacity: float) -> float:
+        try:
+            return await self.store.reserve(key, rate, capacity)
+        except Exception as e:
+            # Fail open: a store outage shouldn't take the LLM endpoints down with it
+            logger.warning(f"Rate limit store error, letting the request through: {e}")
+            return 0.0
+
+    async def _refund(self, key: str, rate: float, capacity: float):
+        try:
+            await self.store.refund(key, rate, capacity)
+        except Exception as e:
+            logger.warning(f"Rate limit store error on refund: {e}")
+
+    async def acquire(self, user_id: str):
+        """Wait for a slot for this user, or raise RateLimited if it can't come within the queue deadline"""
+        if not self.enabled:
+            return
+        deadline = time.monotonic() + self.queue_seconds
+        user_key = f"user:{user_id}"
+
+        wait = await self._reserve(user_key, self.user_rate, self.user_burst)
+        if wait > self.queue_seconds:
+            await self._refund(user_key, self.user_rate, self.user_burst)
+            self.rejected += 1
+            raise RateLimited(wait)
+
+        if wait > 0:
+            self.queued += 1
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._acquire_global(user_id, deadline - time.monotonic(), queued=wait > 0)
+        except (RateLimited, asyncio.CancelledError):
+            await self._refund(user_key, self.user_rate, self.user_burst)
+            raise
+        self.admitted += 1
+
+    async def _acquire_global(self, user_id: str, timeout: float, queued: bool = False):
+        # Fast path when nobody is queued; otherwise join the queue so earlier waiters go first
+        if not self._waiting:
+            wait = await self._reserve(GLOBAL_KEY, self.global_rate, self.global_burst)
+            if wait == 0:
+                return
+            await self._refund(GLOBAL_KEY, self.global_rate, self.global_burst)
+
+        if not queued:
+            self.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user_id, deque()).append(waiter)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(waiter, max(0.0, timeout))
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited(max(1.0, self._backlog() / self.global_rate))
+        finally:
+            self._discard(user_id, waiter)
+
+    def _discard(self, user_id: str, waiter: asyncio.Future):
+        """Drop a waiter that timed out or was cancelled, so it doesn't hold up the fast path"""
+        queue = self._waiting.get(user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[user_id]
+
+    def _backlog(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Next live waiter, taking users in turn"""
+        while self._waiting:
+            user_id, queue = self._waiting.popitem(last=False)
+            waiter = None
+            while queue and waiter is None:
+                candidate = queue.popleft()
+                if not candidate.done():
+                    waiter = candidate
+            if queue:
+                self._waiting[user_id] = queue  # back of the line
+            if waiter is not None:
+                return waiter
+        return None
+
+    async def _dispatch(self):
+        """Hand out global tokens to queued requests as the global bucket refills"""
+        try:
+            while self._waiting:
+                wait = await self._reserve(GLOBAL_KEY, self.global_rate, self.global_burst)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                waiter = self._next_waiter()
+                if waiter is None:
+                    await self._refund(GLOBAL_KEY, self.global_rate, self.global_burst)
+                    break
+                waiter.set_result(None)
+        except Exception as e:
+            logger.exception(f"Rate limit dispatcher failed, releasing queued requests: {e}")
+            while (waiter := self._next_waiter()) is not None:
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "user_per_minute": self.user_rate * 60,
+            "global_per_minute": self.global_rate * 60,
+            "waiting": self._backlog(),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+limiter = RateLimiter.from_env()
@@ -6,6 +6,7 @@ import database
 import auth
 import dependencies
 import models
+import write_behind
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -35,7 +36,7 @@ async def register(user_data: models.UserCreate):
     user_dict = {
         "username": user_data.username,
         "email": user_data.email,
-        "password_hash": auth.get_password_hash(user_data.password),
+        "password_hash": await auth.get_password_hash_async(user_data.password),
         "display_name": user_data.display_name or user_data.username,
         "avatar_icon": "👨‍🚀",
         "created_at": datetime.utcnow(),
@@ -79,17 +80,19 @@ async def login(credentials: models.UserLogin):
         )
     
     # Verify password
-    if not auth.verify_password(credentials.password, user_data["password_hash"]):
+    verified, new_hash = await auth.verify_and_update_password_async(credentials.password, user_data["password_hash"])
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
     
-    # Update last login
-    await db.users.update_one(
-        {"_id": user_data["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
-    )
+    # Update last login (and rehash if the hash settings changed) in the background
+    login_update = {"last_login": datetime.utcnow()}
+    if new_hash:
+        login_update["password_hash"] = new_hash
+    write_behind.queue.touch("users", user_data["_id"], login_update)
+    dependencies.invalidate_user(user_data["_id"])
     
     # Create access token
     access_token = auth.create_access_token(data={"sub": str(user_data["_id"])})
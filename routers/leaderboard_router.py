@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+import database
+import dependencies
+import leaderboard
+import models
+import stats
+
+router = APIRouter(prefix="/api/leaderboard", tags=["Leaderboard"])
+
+WINDOW_PATTERN = f"^({leaderboard.ALL_TIME}|{leaderboard.WEEKLY})$"
+
+
+@router.get("", response_model=models.LeaderboardResponse)
+async def get_leaderboard(
+    track: Optional[str] = None,
+    window: str = Query(leaderboard.ALL_TIME, pattern=WINDOW_PATTERN),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: models.UserInDB = Depends(dependencies.get_current_user)
+):
+    """Get the top users by XP, all-time or this week, globally or for one track"""
+    board = leaderboard.boards.board(track, window)
+    entries = board.top(limit, offset)
+
+    # One query for the names of the page's users
+    profiles = {}
+    if entries:
+        cursor = database.get_collection("users").find(
+            {"_id": {"$in": [stats.user_filter(entry["user_id"])["_id"] for entry in entries]}},
+            {"username": 1, "display_name": 1, "avatar_icon": 1}
+        )
+        profiles = {str(user["_id"]): user async for user in cursor}
+
+    return models.LeaderboardResponse(
+        track=track,
+        window=window,
+        total=len(board),
+        entries=[
+            models.LeaderboardEntry(
+                **entry,
+                username=profiles.get(entry["user_id"], {}).get("username"),
+                display_name=profiles.get(entry["user_id"], {}).get("display_name"),
+                avatar_icon=profiles.get(entry["user_id"], {}).get("avatar_icon")
+            )
+            for entry in entries
+        ]
+    )
+
+
+@router.get("/me", response_model=models.LeaderboardRankResponse)
+async def get_my_rank(
+    track: Optional[str] = None,
+    window: str = Query(leaderboard.ALL_TIME, pattern=WINDOW_PATTERN),
+    current_user: models.UserInDB = Depends(dependencies.get_current_user)
+):
+    """Get the current user's rank and XP on a leaderboard"""
+    board = leaderboard.boards.board(track, window)
+    position = board.rank(current_user.id)
+    if position is None:
+        return models.LeaderboardRankResponse(track=track, window=window, total=len(board))
+
+    return models.LeaderboardRankResponse(
+        track=track,
+        window=window,
+        rank=position["rank"],
+        xp=position["xp"],
+        total=position["total"]
+    )
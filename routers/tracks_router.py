@@ -1,83 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from bson import ObjectId
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import base64
 import logging
 
+import completion
 import database
 import dependencies
+import generated_tasks
+import leaderboard
 import models
+import stats
+import write_behind
 
-# Setup debug logging
-logging.basicConfig(
-    filename='debug_tracks.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    force=True
-)
+router = APIRouter(prefix="/api/tracks", tags=["Tracks"])
+logger = logging.getLogger(__name__)
 
-def calculate_progress_percentage(track_slug: str, tasks_completed: int) -> float:
-    try:
-        import json, os
-        curr_path = f"curriculum/{track_slug}.json"
-        if os.path.exists(curr_path):
-            with open(curr_path) as f:
-                curr_data = json.load(f)
-                total_lessons = len(curr_data.get("lessons", []))
-                if total_lessons > 0:
-                    # 3 tasks per lesson logic
-                    return min(100.0, (tasks_completed / (total_lessons * 3)) * 100)
-    except Exception as e:
-        print(f"Error calculating progress: {e}")
-    # Fallback
-    return min(100.0, tasks_completed * 6.6)
 
-router = APIRouter(prefix="/api/tracks", tags=["Tracks"])
+def track_progress_response(track: dict) -> models.TrackProgressResponse:
+    return models.TrackProgressResponse(
+        id=str(track["_id"]),
+        user_id=str(track["user_id"]), 
+        track_slug=track["track_slug"],
+        track_name=track["track_name"],
+        current_lesson_index=track["current_lesson_index"],
+        current_task_index=track["current_task_index"],
+        percent_complete=track["percent_complete"],
+        lessons_completed=track["lessons_completed"],
+        tasks_completed=track["tasks_completed"],
+        is_enrolled=track["is_enrolled"],
+        started_at=track.get("started_at"),
+        last_accessed=track.get("last_accessed")
+    )
 
 
-@router.get("/enrolled", response_model=List[models.TrackProgressResponse])
-async def get_enrolled_tracks(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
-    """Get all tracks the user is enrolled in"""
-    db = database.get_database()
-    
-    cursor = db.track_progress.find({
-        "user_id": current_user.id,
+async def fetch_enrolled_tracks(user_id: str) -> List[models.TrackProgressResponse]:
+    """Load the user's enrolled tracks, healing stale progress percentages on the way"""
+    cursor = database.get_collection("track_progress").find({
+        "user_id": user_id,
         "is_enrolled": True
     })
     
     tracks = []
     async for track in cursor:
-        logging.info(f"TRACK: {track.get('track_slug')} - Tasks: {track.get('tasks_completed')} - Percent: {track.get('percent_complete')}")
-        
         # Self-healing: Fix 0% progress for existing users
         if track.get("percent_complete", 0) == 0 and track.get("tasks_completed", 0) > 0:
-            percent = calculate_progress_percentage(track["track_slug"], track["tasks_completed"])
+            percent = completion.calculate_progress_percentage(track["track_slug"], track["tasks_completed"])
             track["percent_complete"] = percent
-            # Update DB asynchronously
-            await db.track_progress.update_one(
-                {"_id": track["_id"]},
-                {"$set": {"percent_complete": percent}}
-            )
-            logging.info(f"HEALED: Updated {track['track_slug']} to {percent}%")
+            # Update DB in the background
+            write_behind.queue.touch("track_progress", track["_id"], {"percent_complete": percent})
+            logger.info("Healed track progress", extra={"track_slug": track["track_slug"], "percent_complete": percent})
 
-        tracks.append(models.TrackProgressResponse(
-            id=str(track["_id"]),
-            user_id=str(track["user_id"]), 
-            track_slug=track["track_slug"],
-            track_name=track["track_name"],
-            current_lesson_index=track["current_lesson_index"],
-            current_task_index=track["current_task_index"],
-            percent_complete=track["percent_complete"],
-            lessons_completed=track["lessons_completed"],
-            tasks_completed=track["tasks_completed"],
-            is_enrolled=track["is_enrolled"],
-            started_at=track.get("started_at"),
-            last_accessed=track.get("last_accessed")
-        ))
+        tracks.append(track_progress_response(track))
     
     return tracks
 
 
+@router.get("/enrolled", response_model=List[models.TrackProgressResponse])
+async def get_enrolled_tracks(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
+    """Get all tracks the user is enrolled in"""
+    return await fetch_enrolled_tracks(current_user.id)
+
+
 @router.get("/{track_slug}/progress", response_model=models.TrackProgressResponse)
 async def get_track_progress(
     track_slug: str,
@@ -108,26 +93,10 @@ async def get_track_progress(
             last_accessed=None
         )
     
-    # Update last accessed
-    await db.track_progress.update_one(
-        {"_id": track["_id"]},
-        {"$set": {"last_accessed": datetime.utcnow()}}
-    )
+    # Update last accessed in the background
+    write_behind.queue.touch("track_progress", track["_id"], {"last_accessed": datetime.utcnow()})
     
-    return models.TrackProgressResponse(
-        id=str(track["_id"]),
-        user_id=str(track["user_id"]), 
-        track_slug=track["track_slug"],
-        track_name=track["track_name"],
-        current_lesson_index=track["current_lesson_index"],
-        current_task_index=track["current_task_index"],
-        percent_complete=track["percent_complete"],
-        lessons_completed=track["lessons_completed"],
-        tasks_completed=track["tasks_completed"],
-        is_enrolled=track["is_enrolled"],
-        started_at=track.get("started_at"),
-        last_accessed=track.get("last_accessed")
-    )
+    return track_progress_response(track)
 
 
 @router.post("/{track_slug}/enroll", response_model=models.TrackProgressResponse)
@@ -136,8 +105,6 @@ async def enroll_in_track(
     track_data: models.TrackProgressCreate, 
     current_user: models.UserInDB = Depends(dependencies.get_current_user)
 ):
-    print(f"DEBUG IN ROUTER: models is {models}")
-    print(f"DEBUG DIR: {dir(models)}")
     """Enroll user in a track"""
     db = database.get_database()
     
@@ -179,10 +146,8 @@ async def enroll_in_track(
     result = await db.track_progress.insert_one(track_dict)
     
     # Update user stats - increment courses started
-    await db.users.update_one(
-        {"_id": current_user.id},
-        {"$inc": {"stats.courses_started": 1}}
-    )
+    await db.users.update_one(stats.user_filter(current_user.id), stats.enrollment_update())
+    dependencies.invalidate_user(current_user.id)
     
     return models.TrackProgressResponse(
         id=str(result.inserted_id),
@@ -241,37 +206,125 @@ async def update_track_progress(
     return {"message": "Progress updated successfully"}
 
 
-@router.get("/{track_slug}/tasks/completed", response_model=List[models.TaskCompletionResponse])
+# Large text fields that list views can leave out with ?fields=
+COMPLETION_FIELDS = [
+    "task_id", "user_id", "track_slug", "lesson_index", "task_index", "prompt",
+    "user_output", "ai_evaluation", "score", "feedback_summary", "xp_earned", "completed_at"
+]
+
+
+def encode_completion_cursor(task: dict) -> str:
+    raw = f"{task['completed_at'].isoformat()}|{task['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_completion_cursor(cursor: str):
+    try:
+        completed_at, _, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+        return datetime.fromisoformat(completed_at), ObjectId(task_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def completion_response_fields(task: dict, user_id: str, fields: List[str]) -> dict:
+    defaults = {
+        "user_id": user_id,
+        "task_index": 1, # Default to 1 if missing
+        "prompt": "",
+        "user_output": "",
+        "ai_evaluation": "",
+        "score": None,
+    }
+    return {field: task.get(field, defaults.get(field)) for field in fields}
+
+
+@router.get(
+    "/{track_slug}/tasks/completed",
+    response_model=List[models.TaskCompletionListItem],
+    response_model_exclude_unset=True
+)
 async def get_completed_tasks(
     track_slug: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: models.UserInDB = Depends(dependencies.get_current_user)
 ):
-    """Get all completed tasks for a track"""
+    """
+    Get completed tasks for a track, oldest first.
+    With ?limit= the list is paginated on (completed_at, _id); pass the X-Next-Cursor
+    response header back as ?cursor= for the next page. ?fields=task_id,score,... limits
+    the returned fields so list views can skip prompt, user_output and ai_evaluation.
+    """
     db = database.get_database()
     
-    cursor = db.task_completions.find({
+    selected_fields = COMPLETION_FIELDS
+    projection = None
+    if fields:
+        selected_fields = [field for field in COMPLETION_FIELDS if field in fields.split(",")]
+        projection = {field: 1 for field in selected_fields + ["completed_at"]}
+    
+    query = {
         "user_id": current_user.id,
         "track_slug": track_slug
-    }).sort("completed_at", 1)
+    }
+    if cursor:
+        after_completed_at, after_id = decode_completion_cursor(cursor)
+        query["$or"] = [
+            {"completed_at": {"$gt": after_completed_at}},
+            {"completed_at": after_completed_at, "_id": {"$gt": after_id}}
+        ]
+    
+    tasks_cursor = db.task_completions.find(query, projection).sort([("completed_at", 1), ("_id", 1)])
+    if limit:
+        tasks_cursor = tasks_cursor.limit(limit + 1)
     
-    tasks = []
-    async for task in cursor:
-        tasks.append(models.TaskCompletionResponse(
+    tasks = await tasks_cursor.to_list(length=None)
+    if limit and len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_completion_cursor(tasks[-1])
+    
+    return [
+        models.TaskCompletionListItem(
             id=str(task["_id"]),
-            task_id=task["task_id"],
-            user_id=task.get("user_id", str(current_user.id)),
-            track_slug=task["track_slug"],
-            lesson_index=task["lesson_index"],
-            task_index=task.get("task_index", 1), # Default to 1 if missing
-            prompt=task.get("prompt", ""),
-            user_output=task.get("user_output", ""),
-            ai_evaluation=task.get("ai_evaluation", ""),
-            completed_at=task["completed_at"],
-            score=task.get("score"),
-            xp_earned=task["xp_earned"]
-        ))
+            **completion_response_fields(task, str(current_user.id), selected_fields)
+        )
+        for task in tasks
+    ]
+
+
+@router.get("/{track_slug}/tasks/completed/{completion_id}", response_model=models.TaskCompletionListItem)
+async def get_completed_task(
+    track_slug: str,
+    completion_id: str,
+    current_user: models.UserInDB = Depends(dependencies.get_current_user)
+):
+    """Get a single completed task with its full prompt, output and evaluation"""
+    db = database.get_database()
+    
+    task = None
+    if ObjectId.is_valid(completion_id):
+        task = await db.task_completions.find_one({
+            "_id": ObjectId(completion_id),
+            "user_id": current_user.id,
+            "track_slug": track_slug
+        })
+    
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Completed task not found"
+        )
     
-    return tasks
+    # Stored completions can lack a score (none sent, none parseable), so use the tolerant model
+    return models.TaskCompletionListItem(
+        id=str(task["_id"]),
+        **completion_response_fields(task, str(current_user.id), COMPLETION_FIELDS)
+    )
 
 
 from typing import Dict, Any
@@ -284,127 +337,46 @@ async def complete_task(
 ):
     """Mark a task as completed"""
     try:
-        db = database.get_database()
-    
-        # Check if already completed
-        existing = await db.task_completions.find_one({
-            "user_id": current_user.id,
-            "track_slug": completion_data.get("track_slug"),
-            "task_id": task_id
-        })
-        
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Task already completed"
-            )
-        
-        # Create task completion
-        task_dict = {
-            "user_id": current_user.id,
-            "track_slug": completion_data.get("track_slug"),
-            "task_id": task_id,
-            "lesson_index": completion_data.get("lesson_index"),
-            "task_index": completion_data.get("task_index"), # Succesfully added
-            "prompt": completion_data.get("prompt", ""),
-            "user_output": completion_data.get("user_output", ""),
-            "ai_evaluation": completion_data.get("ai_evaluation", ""),
-            "completed_at": datetime.utcnow(),
-            "score": completion_data.get("score"),
-            "xp_earned": completion_data.get("xp_earned", 10),
-            "time_spent_minutes": completion_data.get("time_spent_minutes", 0)
-        }
-        
-        result = await db.task_completions.insert_one(task_dict)
-        
-        # Update user stats
-        await db.users.update_one(
-            {"_id": current_user.id},
-            {
-                "$inc": {
-                    "stats.total_xp": completion_data.get("xp_earned", 10),
-                    "stats.total_hours": (completion_data.get("time_spent_minutes", 0) or 0) / 60
-                },
-                "$set": {
-                    "stats.last_activity_date": datetime.utcnow()
-                }
-            }
-        )
-        
-        # Update track progress
-        track = await db.track_progress.find_one({
-            "user_id": current_user.id,
-            "track_slug": completion_data.get("track_slug")
-        })
-        
-        if track:
-            # Determine updates based on task progress
-            new_tasks_completed = track["tasks_completed"] + 1
-            
-            current_task_idx = completion_data.get("task_index", 1)
-            current_lesson_idx = completion_data.get("lesson_index", 0)
-            
-            update_fields = {
-                "$inc": {"tasks_completed": 1},
-                "$set": {
-                    "last_accessed": datetime.utcnow(),
-                    "current_task_index": current_task_idx
-                }
-            }
-            
-            # Check if lesson is completed (3 tasks per lesson logic)
-            if current_task_idx >= 3:
-                 update_fields["$inc"]["lessons_completed"] = 1
-                 update_fields["$set"]["current_lesson_index"] = current_lesson_idx + 1
-                 update_fields["$set"]["current_task_index"] = 0 # Reset for next lesson
-            
-            # Calculate progress using shared helper
-            percent = calculate_progress_percentage(completion_data.get('track_slug'), new_tasks_completed)
-            update_fields["$set"]["percent_complete"] = percent
-            
-            logging.info(f"COMPLETED TASK: percent={percent}")
-            
-            await db.track_progress.update_one(
-                {"_id": track["_id"]},
-                update_fields
-            )
+        # Tasks from /generate-task are stored server-side; fill in what the client left out
+        generated_task = await generated_tasks.get_task(task_id, current_user.id)
+        if generated_task is not None:
+            completion_data.setdefault("track_slug", generated_task["track"])
+            completion_data.setdefault("lesson_index", generated_task["lesson_index"])
+            completion_data.setdefault("task_index", generated_task["task_no"])
+            completion_data["task_text"] = generated_task["text"]
         
-        # Update daily activity
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        await db.daily_activities.update_one(
-            {
-                "user_id": current_user.id,
-                "activity_date": today
-            },
-            {
-                "$inc": {
-                    "tasks_completed": 1,
-                    "xp_earned": completion_data.get("xp_earned", 10),
-                    "time_spent_minutes": completion_data.get("time_spent_minutes", 0) or 0
-                }
-            },
-            upsert=True
-        )
+        task_dict = await completion.record_completion(current_user.id, task_id, completion_data)
+        dependencies.invalidate_user(current_user.id)
+        if leaderboard.LEADERBOARD_ENABLED:
+            leaderboard.boards.record(current_user.id, task_dict["track_slug"], task_dict["xp_earned"], task_dict["completed_at"])
         
         return models.TaskCompletionResponse(
-            id=str(result.inserted_id),
+            id=str(task_dict["_id"]),
             task_id=task_id,
             user_id=current_user.id,
-            track_slug=completion_data.get("track_slug"),
-            lesson_index=completion_data.get("lesson_index"),
-            task_index=completion_data.get("task_index"),
-            prompt=completion_data.get("prompt", ""),
-            user_output=completion_data.get("user_output", ""),
-            ai_evaluation=completion_data.get("ai_evaluation", ""),
+            track_slug=task_dict["track_slug"],
+            lesson_index=task_dict["lesson_index"],
+            task_index=task_dict["task_index"],
+            prompt=task_dict["prompt"],
+            user_output=task_dict["user_output"],
+            ai_evaluation=task_dict["ai_evaluation"],
             completed_at=task_dict["completed_at"],
-            score=completion_data.get("score"),
-            xp_earned=completion_data.get("xp_earned", 10)
+            score=task_dict["score"],
+            xp_earned=task_dict["xp_earned"],
+            feedback_summary=task_dict["feedback_summary"]
+        )
+    except completion.TaskAlreadyCompleted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Task already completed"
+        )
+    except completion.InvalidCompletion as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
-        print(f"CRITICAL ERROR IN COMPLETE_TASK: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Task completion failed: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal Server Error: {str(e)}"
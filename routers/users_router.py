@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from bson import ObjectId
 from datetime import datetime, date
 from typing import List
+import asyncio
 
 import database
 import dependencies
+import heatmap
 import models
+import stats
+from routers.tracks_router import fetch_enrolled_tracks
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
 
-@router.get("/me", response_model=models.UserResponse)
-async def get_current_user_info(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
-    """Get current user information"""
+def user_response(current_user: models.UserInDB) -> models.UserResponse:
     return models.UserResponse(
         id=str(current_user.id),
         username=current_user.username,
@@ -23,39 +25,7 @@ async def get_current_user_info(current_user: models.UserInDB = Depends(dependen
     )
 
 
-@router.get("/stats")
-async def get_user_stats(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
-    """Get user statistics for home page"""
-    db = database.get_database()
-    
-    # Get enrolled tracks count
-    enrolled_tracks = await db.track_progress.count_documents({
-        "user_id": current_user.id,
-        "is_enrolled": True
-    })
-    
-    return {
-        "streak_days": current_user.stats.streak_days,
-        "total_xp": current_user.stats.total_xp,
-        "courses_started": enrolled_tracks,
-        "total_hours": current_user.stats.total_hours
-    }
-
-
-@router.get("/daily-progress", response_model=models.DailyActivityResponse)
-async def get_daily_progress(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
-    """Get today's progress for sidebar"""
-    db = database.get_database()
-    
-    # Get today's date (without time)
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Find today's activity
-    activity = await db.daily_activities.find_one({
-        "user_id": current_user.id,
-        "activity_date": today
-    })
-    
+def daily_progress_response(activity: dict | None, today: datetime) -> models.DailyActivityResponse:
     if not activity:
         return models.DailyActivityResponse(
             activity_date=today,
@@ -78,6 +48,68 @@ async def get_daily_progress(current_user: models.UserInDB = Depends(dependencie
     )
 
 
+def start_of_today() -> datetime:
+    """Today's date (without time), as stored in daily_activities"""
+    return stats.start_of_day(datetime.utcnow())
+
+
+@router.get("/me", response_model=models.UserResponse)
+async def get_current_user_info(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
+    """Get current user information"""
+    return user_response(current_user)
+
+
+@router.get("/stats")
+async def get_user_stats(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
+    """Get user statistics for home page"""
+    # Stats are maintained on the user document by the completion and enrollment writes
+    return stats.summarize(current_user)
+
+
+@router.get("/daily-progress", response_model=models.DailyActivityResponse)
+async def get_daily_progress(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
+    """Get today's progress for sidebar"""
+    today = start_of_today()
+    
+    # Find today's activity
+    activity = await database.get_collection("daily_activities").find_one({
+        "user_id": current_user.id,
+        "activity_date": today
+    })
+    
+    return daily_progress_response(activity, today)
+
+
+@router.get("/heatmap", response_model=List[models.DailyActivity])
+async def get_heatmap(
+    days: int = Query(365, ge=1, le=366),
+    current_user: models.UserInDB = Depends(dependencies.get_current_user)
+):
+    """Get active days (task count and XP) for the activity heatmap, oldest first"""
+    return await heatmap.fetch_heatmap(current_user.id, days, start_of_today())
+
+
+@router.get("/dashboard", response_model=models.DashboardResponse)
+async def get_dashboard(current_user: models.UserInDB = Depends(dependencies.get_current_user)):
+    """Get everything the home page needs (user, stats, daily progress, enrolled tracks) in one call"""
+    today = start_of_today()
+    
+    enrolled_tracks, activity = await asyncio.gather(
+        fetch_enrolled_tracks(current_user.id),
+        database.get_collection("daily_activities").find_one({
+            "user_id": current_user.id,
+            "activity_date": today
+        })
+    )
+    
+    return models.DashboardResponse(
+        user=user_response(current_user),
+        stats=stats.summarize(current_user),
+        daily_progress=daily_progress_response(activity, today),
+        enrolled_tracks=enrolled_tracks
+    )
+
+
 @router.put("/profile")
 async def update_profile(
     display_name: str = None,
@@ -103,5 +135,6 @@ async def update_profile(
         {"_id": current_user.id},
         {"$set": update_data}
     )
+    dependencies.invalidate_user(current_user.id)
     
     return {"message": "Profile updated successfully"}
@@ -0,0 +1,73 @@
+"""
+Single-flight: concurrent calls with the same key share one execution.
+A double-submitted /evaluate, or a frontend retry after a client-side timeout, waits for the
+LLM call already in flight instead of paying for a second identical one.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def prompt_key(messages: List[Dict[str, str]], model: str, response_format: Optional[Dict[str, Any]] = None) -> str:
+    """Key of a completion request: the fully built messages, model and response format"""
+    payload = json.dumps({"model": model, "messages": messages, "response_format": response_format}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    The first caller for a key starts the work in its own task; later callers with the same
+    key await that task until it finishes. Every waiter gets the same result or the same
+    exception, and the key is forgotten as soon as the work ends (nothing is cached).
+    A waiter that is cancelled only stops waiting; the work is cancelled when no one is left.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the call the others are waiting on
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Forget it now, so a caller arriving before the cancellation lands starts afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finished(self, key: str, flight: _Flight):
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            # Mark the exception retrieved even if every waiter had already left
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from bson import ObjectId
+
+import models
+
+# Days of per-day XP/minutes kept on the user document for rolling windows
+ACTIVITY_WINDOW_DAYS = 30
+
+
+def start_of_day(moment: datetime) -> datetime:
+    """Midnight of a datetime, as stored in daily_activities"""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def user_filter(user_id: str) -> Dict[str, Any]:
+    # users are keyed by ObjectId while the other collections store the id as a string
+    return {"_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id}
+
+
+def activity_update(xp_earned: int, time_spent_minutes: float, now: datetime) -> List[Dict[str, Any]]:
+    """
+    Update pipeline applying one completion to users.stats and users.activity_window.
+    It mirrors the $inc made to the day's daily_activities document, so the stored
+    stats stay consistent with daily_activities (which backfill_stats.py rebuilds from).
+    xp_earned and time_spent_minutes must already be numbers (completion._number casts them).
+    """
+    today = start_of_day(now)
+    yesterday = today - timedelta(days=1)
+    window_start = today - timedelta(days=ACTIVITY_WINDOW_DAYS - 1)
+
+    window = {"$ifNull": ["$activity_window", []]}
+    today_entries = {"$filter": {"input": window, "as": "day", "cond": {"$eq": ["$$day.date", today]}}}
+    earlier_entries = {"$filter": {
+        "input": window,
+        "as": "day",
+        "cond": {"$and": [{"$ne": ["$$day.date", today]}, {"$gte": ["$$day.date", window_start]}]}
+    }}
+
+    def today_total(field):
+        return {"$sum": {"$map": {"input": today_entries, "as": "day", "in": f"$$day.{field}"}}}
+
+    return [{"$set": {
+        "stats.total_xp": {"$add": [{"$ifNull": ["$stats.total_xp", 0]}, xp_earned]},
+        "stats.total_hours": {"$add": [{"$ifNull": ["$stats.total_hours", 0]}, time_spent_minutes / 60]},
+        "stats.last_activity_date": now,
+        # A day's first completion extends yesterday's streak or starts a new one
+        "stats.streak_days": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$stats.last_active_day", today]},
+                 "then": {"$max": [{"$ifNull": ["$stats.streak_days", 0]}, 1]}},
+                {"case": {"$eq": ["$stats.last_active_day", yesterday]},
+                 "then": {"$add": [{"$ifNull": ["$stats.streak_days", 0]}, 1]}},
+            ],
+            "default": 1
+        }},
+        "stats.last_active_day": today,
+        "activity_window": {"$concatArrays": [earlier_entries, [{
+            "date": today,
+            "xp": {"$add": [today_total("xp"), xp_earned]},
+            "minutes": {"$add": [today_total("minutes"), time_spent_minutes]}
+        }]]}
+    }}]
+
+
+def enrollment_update() -> Dict[str, Any]:
+    return {"$inc": {"stats.courses_started": 1}}
+
+
+def compute_streak(active_days: List[datetime]) -> int:
+    """Length of the run of consecutive days ending at the latest active day"""
+    days = sorted(set(active_days), reverse=True)
+    streak = 0
+    for previous, day in zip([None] + days, days):
+        if previous is not None and previous - day != timedelta(days=1):
+            break
+        streak += 1
+    return streak
+
+
+def summarize(user: models.UserInDB, now: datetime = None) -> Dict[str, Any]:
+    """Stats for the home page, computed from the user document alone"""
+    today = start_of_day(now or datetime.utcnow())
+    stats = user.stats
+
+    # A streak survives until the end of the day after the last active day
+    streak_days = stats.streak_days
+    if stats.last_active_day is None or stats.last_active_day < today - timedelta(days=1):
+        streak_days = 0
+
+    def window_total(field, days):
+        start = today - timedelta(days=days - 1)
+        return sum(getattr(day, field) for day in user.activity_window if day.date >= start)
+
+    return {
+        "streak_days": streak_days,
+        "total_xp": stats.total_xp,
+        "courses_started": stats.courses_started,
+        "total_hours": stats.total_hours,
+        "xp_7d": window_total("xp", 7),
+        "xp_30d": window_total("xp", 30),
+        "hours_7d": window_total("minutes", 7) / 60,
+        "hours_30d": window_total("minutes", 30) / 60,
+    }
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import database
+import llm
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Task pool settings
+TASK_POOL_ENABLED = os.getenv("TASK_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+TASK_POOL_SIZE = int(os.getenv("TASK_POOL_SIZE", "3"))
+TASK_POOL_REFILL_CONCURRENCY = int(os.getenv("TASK_POOL_REFILL_CONCURRENCY", "4"))
+TASK_POOL_WARM_LIMIT = int(os.getenv("TASK_POOL_WARM_LIMIT", "200"))
+# Tasks kept ready in a bucket nobody has been served from yet (a miss, or warm-up).
+# Buckets are only topped up to TASK_POOL_SIZE once a request has actually hit them.
+TASK_POOL_MISS_REFILL = int(os.getenv("TASK_POOL_MISS_REFILL", "1"))
+
+
+def _normalize(value: Optional[str]) -> str:
+    """Free-text preferences, lowercased with whitespace collapsed, so near-identical ones share a bucket"""
+    return " ".join((value or "").split()).lower()
+
+
+def bucket_spec(track: str, lesson_index: int, task_no: int, preferences: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The inputs of task_prompt.build_task_messages that a pooled task depends on"""
+    preferences = preferences or {}
+    return {
+        "track": track,
+        "lesson_index": lesson_index,
+        "task_no": task_no,
+        "role": _normalize(preferences.get("role")),
+        "goal": _normalize(preferences.get("goal")),
+        "level": _normalize(preferences.get("level")),
+    }
+
+
+def bucket_key(spec: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def spec_preferences(spec: Dict[str, Any]) -> Dict[str, str]:
+    return {name: spec[name] for name in ("role", "goal", "level") if spec[name]}
+
+
+class TaskPool:
+    """
+    Keeps a few ready-made tasks per (track, lesson, task_no, role/goal/level) bucket in Mongo.
+    Requests take a task from their bucket and a background worker tops the bucket back up:
+    to `size` after a hit, but only to `miss_refill` after a miss, since task_no moves on after
+    every completion and most missed buckets are never read again.
+    """
+
+    def __init__(self, size: int, refill_concurrency: int, miss_refill: int = TASK_POOL_MISS_REFILL):
+        self.size = size
+        self.refill_concurrency = refill_concurrency
+        self.miss_refill = min(miss_refill, size)
+        self.build_messages: Optional[Callable[..., List[Dict[str, str]]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending = set()
+        self._workers: List[asyncio.Task] = []
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.generated = 0
+
+    async def take(self, track: str, lesson_index: int, task_no: int, preferences: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Pop a ready task for the bucket, or return None if it is empty"""
+        if self._queue is None:
+            return None
+
+        spec = bucket_spec(track, lesson_index, task_no, preferences)
+        key = bucket_key(spec)
+
+        db = database.get_database()
+        doc = await db.task_pool.find_one_and_delete({"bucket": key}, sort=[("created_at", 1)])
+
+        if doc:
+            self.hits += 1
+            self.request_refill(key, spec, self.size)
+            return doc["task"]
+        self.misses += 1
+        self.request_refill(key, spec, self.miss_refill)
+        return None
+
+    def skip(self):
+        """Count a request served an adaptive task without looking at the pool"""
+        self.skipped += 1
+
+    def request_refill(self, key: str, spec: Dict[str, Any], target: int):
+        if self._queue is None or key in self._pending or target <= 0:
+            return
+        self._pending.add(key)
+        self._queue.put_nowait((key, spec, target))
+
+    async def _refill(self, key: str, spec: Dict[str, Any], target: int):
+        db = database.get_database()
+        missing = target - await db.task_pool.count_documents({"bucket": key})
+
+        for _ in range(max(0, missing)):
+            messages = self.build_messages(
+                spec["track"], spec["lesson_index"], spec["task_no"], None, spec_preferences(spec)
+            )
+            task_text = await llm.chat_completion(messages, route=llm.GENERATE)
+            await db.task_pool.insert_one({
+                "bucket": key,
+                **spec,
+                "task": task_text,
+                "created_at": datetime.utcnow()
+            })
+            self.generated += 1
+
+    async def _worker(self):
+        while True:
+            key, spec, target = await self._queue.get()
+            try:
+                await self._refill(key, spec, target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Task pool refill failed for {spec['track']} lesson {spec['lesson_index']}: {e}")
+            finally:
+                self._pending.discard(key)
+                self._queue.task_done()
+
+    async def warm(self):
+        """Queue refills for the next task of recently active enrolled users"""
+        db = database.get_database()
+        cursor = db.track_progress.find(
+            {"is_enrolled": True},
+            {"track_slug": 1, "current_lesson_index": 1, "tasks_completed": 1, "preferences": 1}
+        ).sort("last_accessed", -1).limit(TASK_POOL_WARM_LIMIT)
+
+        async for progress in cursor:
+            spec = bucket_spec(
+                progress["track_slug"],
+                progress.get("current_lesson_index", 0),
+                (progress.get("tasks_completed", 0) % 3) + 1,
+                progress.get("preferences")
+            )
+            self.request_refill(bucket_key(spec), spec, self.miss_refill)
+
+    async def start(self, build_messages: Callable[..., List[Dict[str, str]]]):
+        """Start the background refill workers"""
+        self.build_messages = build_messages
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.refill_concurrency)]
+
+        try:
+            await self.warm()
+        except Exception as e:
+            logger.warning(f"Task pool warm-up failed: {e}")
+
+    async def stop(self):
+        """Stop the background refill workers"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "skipped_adaptive": self.skipped,
+            "generated": self.generated,
+            "pending_refills": len(self._pending),
+        }
+
+
+pool = TaskPool(TASK_POOL_SIZE, TASK_POOL_REFILL_CONCURRENCY)
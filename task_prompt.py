@@ -0,0 +1,89 @@
+"""
+Task generation prompt, laid out for provider-side prompt caching.
+Providers cache the longest previously seen prefix of the messages, so the prompt goes from
+most to least shared: rules (identical for every call), then the lesson block (shared per
+track and lesson) in the system message, then the per-user state (task number,
+personalization, adaptive feedback) in its own message right before the request.
+"""
+import curriculum_registry
+
+MENTOR_RULES = """You are an AI Learning Mentor.
+
+Teaching Flow & Activity Rules based on Lesson (Choose appropriately based on the 'Lesson' below):
+- If Lesson 1 (Understanding LLM Behavior): Briefly explain how LLMs predict the next word. Then, give the user a task to write ONE prompt exploring a complex topic using a specific constraint (e.g., "Explain Quantum mechanics like I'm 10"). The user must submit perfectly ONE prompt and ONE output for evaluation.
+- If Lesson 2 (Core Prompting Techniques): Briefly explain one specific technique (Role, Few-Shot, or Zero-Shot). Then, ask them to write ONE prompt applying that exact technique.
+- If Lesson 3 (Prompt Structure Framework): Briefly introduce the structure "[ROLE] + [CONTEXT] + [TASK] + [CONSTRAINTS] + [OUTPUT FORMAT]". Give them a vague scenario and ask them to write ONE complete prompt following this framework.
+- If Lesson 4 (Iteration & Refinement): Provide a badly formulated prompt. Ask them to write ONE improved prompt that fixes it, and submit the new output.
+- If Lesson 5 (Real-World Applications): Ask the user to pick a real-world task relevant to their role and write ONE highly structured prompt to accomplish it.
+- If Lesson 6 (Advanced Prompting): Ask the user to write ONE advanced prompt that forces the AI to outline steps logically before giving an answer.
+
+General Rules (CRITICAL FOR UI COMPATIBILITY):
+- The testing platform ONLY supports submitting ONE singular User Prompt and ONE AI Output at a time for evaluation.
+- NEVER ask the user to compare multiple prompts in the same task.
+- NEVER ask the user to just answer a question; the task MUST ALWAYS be to create a specific prompt to feed to ChatGPT.
+- ALWAYS end your response by explicitly instructing the user to craft ONE prompt and paste the resulting AI output into the platform for evaluation.
+- Maintain a highly focused, encouraging mentor tone.
+- Follow the User State message (task number, personalization, adaptive instruction) when it is given.
+"""
+
+TASK_REQUEST = "Generate ONE practical task"
+
+
+def get_curriculum(track):
+    """Curriculum for a track, falling back to the chatgpt track"""
+    return curriculum_registry.registry.get(track) or curriculum_registry.registry.get("chatgpt")
+
+
+def lesson_block(track, lesson_index):
+    """The part of the prompt shared by every user on a track's lesson"""
+    target_curriculum = get_curriculum(track)
+    lesson = target_curriculum.lesson(lesson_index)
+
+    return f"""
+Track: {target_curriculum.data.get('track', track)}
+Lesson: {lesson['title']}
+Lesson Description: {lesson['description']}
+Topics: {', '.join(lesson['topics'])}
+"""
+
+
+def user_state_block(task_no, previous_feedback=None, preferences=None):
+    """The per-user part of the prompt"""
+    feedback_instruction = ""
+    if previous_feedback:
+        feedback_instruction = f"""
+ADAPTIVE INSTRUCTION:
+The user previously struggled with: "{previous_feedback}".
+You MUST include a requirement in this new task that specifically forces the user to practice this weak area.
+"""
+
+    preference_instruction = ""
+    if preferences:
+        goal = preferences.get("goal", "general learning")
+        level = preferences.get("level", "intermediate")
+        role = preferences.get("role", "student")
+
+        preference_instruction = f"""
+PERSONALIZATION (CRITICAL):
+- The User's Role is: {role}
+- The User's Goal is: {goal}
+- Skill Level: {level}
+
+You MUST tailor everything about this task specifically to resonate with someone who is a "{role}".
+The scenario you create, the examples you use, and the terminology MUST be uniquely relevant to a {role} trying to achieve their goal of {goal}.
+If they are a Marketer, the scenario is a marketing campaign. If a Developer, it's code generation.
+If a Founder, it's a pitch deck. Speak to them and craft tasks purely in the context of their daily responsibilities!
+"""
+
+    return f"""User State:
+- Task Number: {task_no}
+{preference_instruction}
+{feedback_instruction}"""
+
+
+def build_task_messages(track, lesson_index, task_no, previous_feedback=None, preferences=None):
+    return [
+        {"role": "system", "content": MENTOR_RULES + lesson_block(track, lesson_index)},
+        {"role": "system", "content": user_state_block(task_no, previous_feedback, preferences)},
+        {"role": "user", "content": TASK_REQUEST}
+    ]
@@ -0,0 +1,18 @@
+import time
+
+from jose import jwt
+
+import auth
+
+
+def test_malformed_kid_fails_verification():
+    for kid in (["a"], {"a": 1}, 7):
+        token = jwt.encode(
+            {"sub": "alice", "exp": int(time.time()) + 60}, auth.SECRET_KEY, algorithm=auth.ALGORITHM, headers={"kid": kid}
+        )
+        assert auth.decode_access_token(token) is None
+
+
+def test_token_without_kid_still_verifies():
+    token = auth.create_access_token({"sub": "alice"})
+    assert auth.decode_access_token(token)["sub"] == "alice"
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import ratelimit
+
+
+def make_limiter(user_per_minute, user_burst, global_per_minute, global_burst, queue_seconds):
+    return ratelimit.RateLimiter(
+        ratelimit.MemoryStore(), user_per_minute, user_burst, global_per_minute, global_burst, queue_seconds, enabled=True
+    )
+
+
+async def attempt(limiter, user_id, delay=0.0):
+    """True if admitted, False if rate limited"""
+    await asyncio.sleep(delay)
+    try:
+        await limiter.acquire(user_id)
+        return True
+    except ratelimit.RateLimited:
+        return False
+
+
+def test_heavy_user_is_capped_at_burst_plus_refill():
+    # 1 request/s with a burst of 3; a 1.5 s queue lets one more refill in
+    limiter = make_limiter(60, 3, 60000, 1000, queue_seconds=1.5)
+
+    async def scenario():
+        return await asyncio.gather(*(attempt(limiter, "heavy") for _ in range(10)))
+
+    admitted = asyncio.run(scenario())
+    assert sum(admitted) == 3 + 1
+    assert limiter.stats()["rejected"] == 6
+
+
+def test_light_users_are_admitted_under_the_global_budget():
+    # Per-user limits out of the way: one user floods the global bucket (100/s, burst 5)
+    limiter = make_limiter(60000, 1000, 6000, 5, queue_seconds=0.3)
+
+    async def scenario():
+        start = time.monotonic()
+        heavy = [attempt(limiter, "heavy") for _ in range(100)]
+        light = [attempt(limiter, f"light-{i}", delay=0.01) for i in range(5)]
+        results = await asyncio.gather(*heavy, *light)
+        return results[:100], results[100:], time.monotonic() - start
+
+    heavy, light, elapsed = asyncio.run(scenario())
+    assert all(light)
+    # Nothing is admitted beyond the global burst plus what refilled meanwhile
+    assert sum(heavy) + sum(light) <= 5 + 100 * elapsed + 1
+    assert sum(heavy) < 100
+
+
+def test_rejected_requests_refund_the_user_token():
+    # The global bucket has one token and refills once a minute
+    limiter = make_limiter(1, 2, 1, 1, queue_seconds=0.1)
+
+    async def scenario():
+        first = await attempt(limiter, "user")
+        second = await attempt(limiter, "user")  # user token taken, then times out on the global bucket
+        return first, second
+
+    assert asyncio.run(scenario()) == (True, False)
+    # Only the admitted request keeps its token
+    assert limiter.store._buckets.get("user:user").tokens == pytest.approx(1, abs=0.01)
+
+
+def test_requests_over_the_user_queue_deadline_are_refunded():
+    limiter = make_limiter(1, 1, 60000, 1000, queue_seconds=0)
+
+    async def scenario():
+        return await asyncio.gather(*(attempt(limiter, "user") for _ in range(10)))
+
+    assert sum(asyncio.run(scenario())) == 1
+    # Rejected requests gave their tokens back, so the bucket isn't nine requests in debt
+    assert limiter.store._buckets.get("user:user").tokens == pytest.approx(0, abs=0.01)
+
+
+def test_mongo_store_refund_is_capped_at_capacity(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(ratelimit.database, "get_collection", lambda name: db[name])
+    store = ratelimit.MongoStore()
+
+    async def scenario():
+        await store.reserve("user:a", 1, 3)
+        for _ in range(5):
+            await store.refund("user:a", 1, 3)
+        return await db.rate_limits.find_one({"_id": "user:a"})
+
+    assert asyncio.run(scenario())["tokens"] == 3
@@ -0,0 +1,94 @@
+import asyncio
+
+import llm
+import singleflight
+
+
+def test_error_reaches_every_waiter_from_one_call():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream failed")
+
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", failing) for _ in range(5)), return_exceptions=True)
+        return flights, results
+
+    flights, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "upstream failed" for result in results)
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+
+def test_cancelled_waiter_leaves_the_others_their_result():
+    calls = 0
+
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        waiters = [asyncio.create_task(flights.do("key", slow)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["answer", "answer"]
+
+
+def test_last_waiter_cancelled_cancels_the_shared_call():
+    upstream_cancelled = False
+
+    async def slow():
+        nonlocal upstream_cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            upstream_cancelled = True
+            raise
+
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        waiters = [asyncio.create_task(flights.do("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(scenario())
+    assert upstream_cancelled
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_llm_chat_completion_shares_one_gateway_call(monkeypatch):
+    calls = []
+
+    async def fake_completion(messages, route, model, max_retries, response_format):
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(llm, "LLM_SINGLE_FLIGHT", True)
+    monkeypatch.setattr(llm.gateway, "chat_completion", fake_completion)
+    messages = [{"role": "user", "content": "Grade this"}]
+
+    async def scenario():
+        return await asyncio.gather(
+            *(llm.chat_completion(messages, route=llm.EVALUATE) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [str(result) for result in results] == ["provider down"] * 3
@@ -0,0 +1,52 @@
+import asyncio
+
+import write_behind
+
+
+class SlowCollection:
+    """bulk_write that takes `delay` seconds, recording the updates it wrote"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.written = []
+
+    async def bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(self.delay)
+        self.written.extend(requests)
+
+
+def test_stop_during_slow_bulk_write_drains_everything():
+    async def scenario():
+        users = SlowCollection(0.2)
+        queue = write_behind.WriteBehindQueue(flush_interval=0.01, max_batch=100)
+        queue.start({"users": users})
+        queue.touch("users", 1, {"last_login": 1})
+        queue.touch("users", 2, {"last_login": 2})
+        await asyncio.sleep(0.05)
+        # The flusher has swapped the batch out and is inside bulk_write
+        assert queue.stats()["pending"] == 0
+        assert users.written == []
+
+        queue.touch("users", 3, {"last_login": 3})
+        await queue.stop()
+        return users, queue
+
+    users, queue = asyncio.run(scenario())
+    assert queue.stats() == {"pending": 0, "flushed": 3}
+    assert sorted(update._filter["_id"] for update in users.written) == [1, 2, 3]
+
+
+def test_cancelled_flush_requeues_unwritten_batch():
+    async def scenario():
+        users = SlowCollection(1)
+        queue = write_behind.WriteBehindQueue(flush_interval=60, max_batch=100)
+        queue._db = {"users": users}
+        queue.touch("users", 1, {"last_login": 1})
+        flush = asyncio.create_task(queue.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.stats() == {"pending": 1, "flushed": 0}
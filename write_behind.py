@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+
+
+class WriteBehindQueue:
+    """
+    Buffers touch-style $set updates that don't affect the response (last_accessed, last_login, ...).
+    Updates to the same document are coalesced and flushed in bulk_write batches by a background task.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._db = None
+        self._pending: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+
+    def touch(self, collection: str, document_id: Any, fields: Dict[str, Any]):
+        """Queue a $set on one document, merged with any update already pending for it"""
+        self._pending.setdefault((collection, document_id), {}).update(fields)
+
+        if len(self._pending) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self):
+        if not self._pending or self._db is None:
+            return
+
+        pending, self._pending = self._pending, {}
+
+        by_collection: Dict[str, list] = {}
+        for (collection, document_id), fields in pending.items():
+            by_collection.setdefault(collection, []).append((document_id, fields))
+        batches = [
+            (collection, updates[start:start + self.max_batch])
+            for collection, updates in by_collection.items()
+            for start in range(0, len(updates), self.max_batch)
+        ]
+
+        error = None
+        for i, (collection, batch) in enumerate(batches):
+            try:
+                await self._db[collection].bulk_write(
+                    [UpdateOne({"_id": document_id}, {"$set": fields}) for document_id, fields in batch],
+                    ordered=False
+                )
+                self.flushed += len(batch)
+            except asyncio.CancelledError:
+                # Swapped out of _pending already: put back what wasn't written so it isn't lost
+                for collection, batch in batches[i:]:
+                    self._requeue(collection, batch)
+                raise
+            except Exception as e:
+                self._requeue(collection, batch)
+                error = e
+
+        if error is not None:
+            raise error
+
+    def _requeue(self, collection: str, batch: list):
+        # Fields touched again since the failed flush are newer and win
+        for document_id, fields in batch:
+            pending_fields = self._pending.setdefault((collection, document_id), {})
+            for name, value in fields.items():
+                pending_fields.setdefault(name, value)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Write-behind flush failed: {e}")
+
+    def start(self, db):
+        """Start the background flusher for a database"""
+        self._db = db
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and drain anything still pending"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it mid-bulk_write
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Write-behind drain failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "flushed": self.flushed}
+
+
+queue = WriteBehindQueue(WRITE_BEHIND_FLUSH_INTERVAL_SECONDS, WRITE_BEHIND_MAX_BATCH)